@@ -1,33 +1,43 @@
+from __future__ import annotations
+
 from asyncio import run as asyncio_run
 from datetime import UTC, datetime
-from os import getenv
+from os import environ
 from pathlib import Path
 from shutil import rmtree
 from subprocess import CalledProcessError
 from subprocess import run as subprocess_run
 from sys import exit as sys_exit
 from tempfile import mkdtemp
-from typing import Annotated
+from typing import TYPE_CHECKING, Annotated
 
 import smello
 import typer
 from dotenv import load_dotenv
 from httpx import ConnectError, TimeoutException, get
 from loguru import logger
-from src.client import TidlClient
-from src.dl import Download
-from src.services import TrackService
 from src.setup_logging import setup_logging
 
+if TYPE_CHECKING:
+    from src.client import TidlClient
+    from src.dl import Download
+
 app = typer.Typer()
 load_dotenv()
 setup_logging()
 
+# Resolved once, after .env has been loaded
+PLAYLIST_ID = environ.get("AHORATEVAS")
+TEST_PLAYLIST_ID = environ.get("TEST_PL")
+SMELLO_URL = environ.get("SMELLO_URL", "http://localhost:5110")
+
 
 def authenticate_client() -> TidlClient:
     """Authenticate and return client."""
+    from src.client import get_client  # noqa: PLC0415
+
     logger.info("🔐 Initializing client...")
-    client = TidlClient()
+    client = get_client()
 
     logger.info("🔑 Authenticating with TIDAL...")
     if not client.authenticate_pkce():
@@ -38,6 +48,12 @@ def authenticate_client() -> TidlClient:
     return client
 
 
+async def download_playlist(downloader: Download, playlist_id: str) -> dict[str, bool]:
+    """Download a playlist, closing the downloader's client and worker pool afterwards."""
+    async with downloader:
+        return await downloader.orchestrate_download(playlist_id)
+
+
 def display_results(results: dict[str, bool]) -> None:
     """Display download results."""
     successful = sum(v is True for v in results.values())
@@ -61,9 +77,9 @@ def main(*, test_run: Annotated[bool, typer.Option("--test-run", help="Run Api T
 
     if test_run:
         logger.info("Running in test mode. TEST_PL, temp dir, skip DB")
-        playlist_id = getenv("TEST_PL")
+        playlist_id = TEST_PLAYLIST_ID
 
-        server_url = getenv("SMELLO_URL", "http://localhost:5110")
+        server_url = SMELLO_URL
         _ensure_smello_server(server_url)
 
         download_dir = Path(mkdtemp(prefix="test-pl-"))
@@ -79,7 +95,7 @@ def main(*, test_run: Annotated[bool, typer.Option("--test-run", help="Run Api T
         )
         logger.info("Smello initialized for test run")
     else:
-        playlist_id = getenv("AHORATEVAS")
+        playlist_id = PLAYLIST_ID
 
         download_dir = Path("./downloads")
         skip_existing = True
@@ -88,6 +104,10 @@ def main(*, test_run: Annotated[bool, typer.Option("--test-run", help="Run Api T
         logger.error("No playlist ID provided. Exiting.")
         return
 
+    # Deferred so that --help and the missing-playlist exit don't pay for the tidalapi/httpx/ffmpeg import chain
+    from src.dl import Download  # noqa: PLC0415
+    from src.services import TrackService  # noqa: PLC0415
+
     client = authenticate_client()
     track_service = TrackService(client.session)
     downloader = Download(
@@ -103,7 +123,7 @@ def main(*, test_run: Annotated[bool, typer.Option("--test-run", help="Run Api T
     )
 
     logger.info("📥 Processing...")
-    results = asyncio_run(downloader.orchestrate_download(playlist_id))
+    results = asyncio_run(download_playlist(downloader, playlist_id))
     display_results(results)
 
     # Cleanup temp dir on success, keep on failure
@@ -1,27 +1,71 @@
-from collections.abc import Iterator
-from typing import ClassVar
+from __future__ import annotations
+
+from asyncio import Semaphore, TaskGroup, gather, get_running_loop, to_thread
+from asyncio import run as asyncio_run
+from collections import OrderedDict
+from functools import cache
+from time import monotonic
+from typing import TYPE_CHECKING, Any
 
 import requests
 from loguru import logger
-from tidalapi import Quality, Session, Track
+from orjson import JSONDecodeError
+from orjson import loads as orjson_loads
+from requests.adapters import HTTPAdapter, Retry
+from tidalapi import Playlist, Quality, Session, Track
 
 from src.exceptions import AuthError, PlaylistError, StreamInfoError
-from src.setup_logging import setup_logging
-from src.track_metadata import TrackMetaData
+from src.stream_info import QUALITY_PREFERENCES
+from src.track_metadata import TrackColumns, TrackMetaData, tracks_to_columns
+
+if TYPE_CHECKING:
+    from requests import PreparedRequest
+    from urllib3 import BaseHTTPResponse
+
+TRACK_LOOKUP_CONCURRENCY = 8
+METADATA_CONCURRENCY = 5
+HTTP_POOL_CONNECTIONS = 16
+HTTP_POOL_MAXSIZE = 64
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+AUTH_CHECK_TTL = 30.0
+PLAYLIST_CACHE_TTL = 60.0
+TRACK_INFO_CACHE_SIZE = 1024
+
+
+def _ensure_no_running_loop(async_name: str) -> None:
+    """Fail clearly when a synchronous wrapper around ``asyncio.run`` is called from inside an event loop.
 
-setup_logging()
+    Raises:
+        RuntimeError: If an event loop is running in this thread.
 
+    """
+    try:
+        get_running_loop()
+    except RuntimeError:
+        return
+    msg = f"Cannot be called from a running event loop, await {async_name}() instead"
+    raise RuntimeError(msg)
+
+
+class OrjsonResponse(requests.Response):
+    """Response that decodes JSON bodies with orjson instead of the stdlib json module."""
+
+    def json(self, **kwargs) -> Any:  # noqa: ANN401
+        if kwargs:
+            return super().json(**kwargs)
+        try:
+            return orjson_loads(self.content)
+        except JSONDecodeError as e:
+            raise requests.JSONDecodeError(e.msg, e.doc, e.pos) from e
 
-class SingletonMeta(type):
-    """Metaclass to ensure only one instance of a class is created."""
 
-    _instances: ClassVar[dict[type, object]] = {}
+class PooledHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose responses decode JSON with orjson."""
 
-    def __call__(cls, *args, **kwargs) -> object:
-        if cls not in cls._instances:
-            instance = super().__call__(*args, **kwargs)
-            cls._instances[cls] = instance
-        return cls._instances[cls]
+    def build_response(self, req: PreparedRequest, resp: BaseHTTPResponse) -> requests.Response:
+        response = super().build_response(req, resp)
+        response.__class__ = OrjsonResponse
+        return response
 
 
 class TidlSession(Session):
@@ -29,19 +73,44 @@ class TidlSession(Session):
 
     def __init__(self) -> None:
         super().__init__()
+        self._mount_pooled_adapter()
         logger.debug("Session instance created.")
 
+    def _mount_pooled_adapter(self) -> None:
+        """Mount a pooled, retrying adapter on the underlying requests session.
+
+        Every tidalapi call goes through `request_session`, so all of them (including the concurrent
+        lookups in TidlClient) reuse keep-alive connections instead of opening a new TLS connection,
+        and have their JSON bodies parsed by orjson.
+        """
+        retries = Retry(total=3, backoff_factor=0.3, status_forcelist=RETRY_STATUS_CODES, raise_on_status=False)
+        adapter = PooledHTTPAdapter(
+            pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=retries
+        )
+        self.request_session.mount("https://", adapter)
+        self.request_session.headers["Connection"] = "keep-alive"
+
     def get_user_id(self) -> int:
         """Get the user ID of the logged-in user."""
         return self.user.id
 
 
-class TidlClient(metaclass=SingletonMeta):
-    """A simple TIDL API client."""
+class TidlClient:
+    """A simple TIDL API client.
+
+    Use get_client() for the process-wide instance; constructing one directly gives a separate session.
+    """
 
     def __init__(self) -> None:
         self.session = TidlSession()
         self._authenticated = False
+        self._auth_checked_at = 0.0
+        self._auth_checked_token: str | None = None
+        self._playlist_cache: dict[str, tuple[float, Playlist, list[Track]]] = {}
+        # Least recently used entries are evicted past TRACK_INFO_CACHE_SIZE, as the client lives for the whole process
+        self._track_info_cache: OrderedDict[str, str] = OrderedDict()
+        # A 401 on any API call means the session was revoked, so a cached auth check must not vouch for it
+        self.session.request_session.hooks["response"].append(self._invalidate_auth_on_401)
         logger.debug("Client instance created.")
 
     def authenticate_oauth(self) -> bool:
@@ -66,6 +135,7 @@ class TidlClient(metaclass=SingletonMeta):
 
                 logger.debug("Session login check result: {}", user_check)
                 self._authenticated = True
+                self._remember_auth_check()
                 # Set highest quality with fallback for lossless downloads
                 self._set_highest_available_quality()
                 logger.info("Authentication successful.")
@@ -93,6 +163,7 @@ class TidlClient(metaclass=SingletonMeta):
 
                 logger.debug("Session login check result: {}", user_check)
                 self._authenticated = True
+                self._remember_auth_check()
                 # Set highest quality with fallback for lossless downloads
                 self._set_highest_available_quality()
                 logger.info("PKCE authentication successful - HiRes access enabled.")
@@ -107,9 +178,7 @@ class TidlClient(metaclass=SingletonMeta):
         3. HIGH (320kbps AAC)
         4. LOW (96kbps AAC)
         """
-        quality_preferences = [Quality.hi_res_lossless, Quality.high_lossless, Quality.low_320k, Quality.low_96k]
-
-        for quality in quality_preferences:
+        for quality in QUALITY_PREFERENCES:
             try:
                 self.session.audio_quality = quality
             except (AttributeError, ValueError):
@@ -129,11 +198,9 @@ class TidlClient(metaclass=SingletonMeta):
         Tries to get the highest quality stream available for the specific track.
         Returns the track and the actual quality obtained.
         """
-        quality_preferences = [Quality.hi_res_lossless, Quality.high_lossless, Quality.low_320k, Quality.low_96k]
-
         original_quality = self.session.audio_quality
 
-        for quality in quality_preferences:
+        for quality in QUALITY_PREFERENCES:
             try:
                 self.session.audio_quality = quality
                 stream = track.get_stream()
@@ -152,16 +219,78 @@ class TidlClient(metaclass=SingletonMeta):
         raise StreamInfoError(msg)
 
     def is_authenticated(self) -> bool:
-        """Check if the session is authenticated."""
+        """Check if the session is authenticated.
+
+        A successful check is reused for AUTH_CHECK_TTL seconds as long as the access token is unchanged,
+        so repeated calls don't each cost a round trip to the API.
+        """
         auth_flag = getattr(self, "_authenticated", False)
+        if auth_flag and self._auth_check_is_fresh():
+            return True
+
         try:
             session_check = self.session.check_login()
         except (requests.RequestException, ValueError, OSError) as e:
             logger.error("Session check failed: {}", e)
+            self.invalidate_auth_cache()
             return False
         else:
             logger.debug("Auth flag: {}, Session check: {}", auth_flag, session_check)
-            return auth_flag and session_check
+            if auth_flag and session_check:
+                self._remember_auth_check()
+                return True
+            self.invalidate_auth_cache()
+            return False
+
+    def invalidate_auth_cache(self) -> None:
+        """Force the next is_authenticated call to check the session against the API."""
+        self._auth_checked_at = 0.0
+        self._auth_checked_token = None
+
+    def _invalidate_auth_on_401(self, response: requests.Response, *_args: object, **_kwargs: object) -> None:
+        """Response hook on the API session that drops the cached auth check when a request is unauthorized."""
+        if response.status_code == requests.codes.unauthorized:
+            logger.debug("Got 401 from {}, invalidating cached auth check", response.url)
+            self.invalidate_auth_cache()
+
+    def _remember_auth_check(self) -> None:
+        self._auth_checked_at = monotonic()
+        self._auth_checked_token = self.session.access_token
+
+    def _auth_check_is_fresh(self) -> bool:
+        return (
+            self._auth_checked_token is not None
+            and self._auth_checked_token == self.session.access_token
+            and monotonic() - self._auth_checked_at < AUTH_CHECK_TTL
+        )
+
+    def _get_playlist_with_tracks(self, playlist_id: str) -> tuple[Playlist, list[Track]]:
+        """Fetch a playlist and its tracks, reusing a recent fetch of the same playlist.
+
+        Entries live for PLAYLIST_CACHE_TTL seconds, so listing a playlist and then building its detailed
+        metadata costs one playlist GET and one tracks GET instead of two of each. Expired entries are
+        dropped on every fetch, so full track lists do not stay in memory for the life of the process.
+        """
+        now = monotonic()
+        cached = self._playlist_cache.get(playlist_id)
+        if cached and now - cached[0] < PLAYLIST_CACHE_TTL:
+            logger.debug("Using cached playlist {}", playlist_id)
+            return cached[1], cached[2]
+
+        expired = [key for key, entry in self._playlist_cache.items() if now - entry[0] >= PLAYLIST_CACHE_TTL]
+        for key in expired:
+            del self._playlist_cache[key]
+
+        try:
+            playlist = self.session.playlist(playlist_id)
+        except (requests.RequestException, ValueError, KeyError, OSError, AttributeError) as e:
+            logger.error("Error fetching playlist {}: {}", playlist_id, e)
+            msg = f"Failed to fetch playlist: {e}"
+            raise PlaylistError(msg) from e
+        else:
+            tracks = playlist.tracks()
+            self._playlist_cache[playlist_id] = (monotonic(), playlist, tracks)
+            return playlist, tracks
 
     def get_playlist_tracks(self, playlist_id: str) -> list[Track]:
         """Get tracks from a playlist by its ID."""
@@ -170,52 +299,105 @@ class TidlClient(metaclass=SingletonMeta):
             msg = "Not authenticated"
             raise AuthError(msg)
 
-        try:
-            playlist = self.session.playlist(playlist_id)
-        except (requests.RequestException, ValueError, KeyError, AttributeError) as e:
-            logger.error("Error fetching playlist tracks: {}", e)
-            msg = f"Failed to fetch playlist tracks: {e}"  # Fixed formatting
-            raise PlaylistError(msg) from e
-        else:
-            tracks = playlist.tracks()
-            playlist_name = playlist.name
-            logger.info("Fetched {} tracks from playlist {}", len(tracks), playlist_name)
-            return tracks
+        playlist, tracks = self._get_playlist_with_tracks(playlist_id)
+        logger.info("Fetched {} tracks from playlist {}", len(tracks), playlist.name)
+        return tracks
 
-    def get_playlist_tracks_detailed(self, playlist_id: str) -> list[TrackMetaData]:
-        """Fetch detailed track metadata for all tracks in a playlist."""
+    async def get_playlist_tracks_detailed_async(self, playlist_id: str) -> list[TrackMetaData]:
+        """Fetch detailed track metadata for all tracks in a playlist concurrently.
+
+        Each TrackMetaData is built in a worker thread (it downloads the cover image), with at most
+        METADATA_CONCURRENCY requests in flight to stay under the API rate limits.
+        """
         if not self.is_authenticated():
             logger.error("Cannot fetch playlist tracks: not authenticated.")
             msg = "Not authenticated"
             raise AuthError(msg)
 
-        try:
-            playlist = self.session.playlist(playlist_id)
-        except (requests.RequestException, ValueError, KeyError, OSError, AttributeError) as e:
-            logger.error("Error fetching playlist {}: {}", playlist_id, e)
-            msg = f"Failed to fetch playlist: {e}"
-            raise PlaylistError(msg) from e
-        else:
-            tracks = playlist.tracks()
-            playlist_name = playlist.name
-            logger.info("Fetched playlist: {} with {} tracks", playlist_name, len(tracks))
+        playlist, tracks = await to_thread(self._get_playlist_with_tracks, playlist_id)
+        logger.info("Fetched playlist: {} with {} tracks", playlist.name, len(tracks))
+
+        semaphore = Semaphore(METADATA_CONCURRENCY)
+
+        async def build_metadata(track: Track) -> TrackMetaData:
+            async with semaphore:
+                return await to_thread(TrackMetaData.from_track, track)
 
-            return [TrackMetaData.from_track(track) for track in tracks]
+        async with TaskGroup() as tg:
+            tasks = [tg.create_task(build_metadata(track)) for track in tracks]
 
-    def get_track_info(self, tracks: list[str]) -> Iterator[str]:
-        """Get track information for a list of track IDs."""
+        return [task.result() for task in tasks]
+
+    def get_playlist_tracks_detailed(self, playlist_id: str) -> list[TrackMetaData]:
+        """Fetch detailed track metadata for all tracks in a playlist.
+
+        Synchronous wrapper around ``get_playlist_tracks_detailed_async``, which is the API to use from async code;
+        this one cannot be called while an event loop is running.
+        """
+        _ensure_no_running_loop("get_playlist_tracks_detailed_async")
+        return asyncio_run(self.get_playlist_tracks_detailed_async(playlist_id))
+
+    def get_playlist_tracks_columnar(self, playlist_id: str) -> TrackColumns:
+        """Fetch the tracks of a playlist as parallel columns (ids, titles, artists, ...).
+
+        Meant for bulk callers that only read a few fields; see tracks_to_columns for the trade-off.
+        """
+        return tracks_to_columns(self.get_playlist_tracks(playlist_id))
+
+    async def get_track_info_async(self, tracks: list[str]) -> list[str]:
+        """Get track information for a list of track IDs concurrently.
+
+        Lookups run in worker threads so their round trips overlap, bounded by TRACK_LOOKUP_CONCURRENCY.
+        Repeated IDs are looked up once and the most recent TRACK_INFO_CACHE_SIZE are remembered on the client.
+        Results keep the order of the given IDs; failed lookups are logged and skipped.
+        """
         if not self.is_authenticated():
             logger.error("Cannot fetch track info: not authenticated.")
             msg = "Not authenticated"
             raise AuthError(msg)
 
-        for track_id in tracks:
-            try:
-                track = self.session.track(track_id)
-            except (requests.RequestException, ValueError, KeyError, AttributeError) as e:
-                logger.error("Error fetching track info for ID {}: {}", track_id, e)
-                continue
-            else:
-                track_info = f"{track.artist.name} - {track.name}"
-                logger.info("Fetched track info: {}", track_info)
-                yield track_info
+        semaphore = Semaphore(TRACK_LOOKUP_CONCURRENCY)
+
+        async def fetch_track_info(track_id: str) -> str | None:
+            async with semaphore:
+                try:
+                    track = await to_thread(self.session.track, track_id)
+                except (requests.RequestException, ValueError, KeyError, AttributeError) as e:
+                    logger.error("Error fetching track info for ID {}: {}", track_id, e)
+                    return None
+
+            track_info = f"{track.artist.name} - {track.name}"
+            logger.info("Fetched track info: {}", track_info)
+            return track_info
+
+        # Fetch each ID at most once, and only if an earlier call hasn't resolved it already
+        cache = self._track_info_cache
+        resolved = {track_id: cache[track_id] for track_id in dict.fromkeys(tracks) if track_id in cache}
+        pending = [track_id for track_id in dict.fromkeys(tracks) if track_id not in resolved]
+        results = await gather(*(fetch_track_info(track_id) for track_id in pending))
+        resolved.update(
+            (track_id, track_info) for track_id, track_info in zip(pending, results, strict=True) if track_info
+        )
+
+        for track_id, track_info in resolved.items():
+            cache[track_id] = track_info
+            cache.move_to_end(track_id)
+        while len(cache) > TRACK_INFO_CACHE_SIZE:
+            cache.popitem(last=False)
+
+        return [resolved[track_id] for track_id in tracks if track_id in resolved]
+
+    def get_track_info(self, tracks: list[str]) -> list[str]:
+        """Get track information for a list of track IDs.
+
+        Synchronous wrapper around ``get_track_info_async``, which is the API to use from async code:
+        every lookup finishes before this returns, and it cannot be called while an event loop is running.
+        """
+        _ensure_no_running_loop("get_track_info_async")
+        return asyncio_run(self.get_track_info_async(tracks))
+
+
+@cache
+def get_client() -> TidlClient:
+    """Return the shared TidlClient instance."""
+    return TidlClient()
@@ -3,11 +3,23 @@
 Uses SQLite via Python's built-in sqlite3 module.
 """
 
+from __future__ import annotations
+
 import json
 import sqlite3
+from atexit import register as atexit_register
+from collections import Counter
+from concurrent.futures import Future
+from contextlib import closing, contextmanager
 from datetime import UTC, datetime
+from functools import lru_cache
+from operator import attrgetter
 from pathlib import Path
-from typing import Any, TypedDict, Unpack
+from queue import Empty, Queue
+from threading import Lock, Thread
+from time import monotonic, time
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, Self, TypedDict, Unpack
 
 from loguru import logger
 from tidalapi.media import Track
@@ -15,9 +27,10 @@ from tidalapi.media import Track
 from src.exceptions import DBError
 from src.setup_logging import setup_logging
 
-DB_PATH = Path(__file__).parent.parent / "downloads.db"
+if TYPE_CHECKING:
+    from collections.abc import Generator, Iterable, Mapping, Sequence
 
-setup_logging()
+DB_PATH = Path(__file__).parent.parent / "downloads.db"
 
 
 class DownloadMetadata(TypedDict, total=False):
@@ -96,9 +109,39 @@ CREATE TABLE IF NOT EXISTS playlist_tracks (
     FOREIGN KEY(playlist_id) REFERENCES playlists(id),
     FOREIGN KEY(track_id) REFERENCES tracks(id)
 );
+
+-- Superseded by stream_cache, which keys entries by quality as well
+DROP TABLE IF EXISTS stream_info_cache;
+
+CREATE TABLE IF NOT EXISTS stream_cache (
+    track_id TEXT,
+    quality TEXT,
+    stream_json TEXT,
+    fetched_at REAL,
+    PRIMARY KEY (track_id, quality)
+);
+
+CREATE INDEX IF NOT EXISTS idx_downloads_track_id ON downloads(track_id);
+CREATE INDEX IF NOT EXISTS idx_tracks_album_id ON tracks(album_id);
+CREATE INDEX IF NOT EXISTS idx_playlist_tracks_track_id ON playlist_tracks(track_id);
 """
 
 
+# WAL + synchronous=NORMAL drops the fsync per commit; WAL mode persists in the file, the rest is per connection
+CONNECTION_PRAGMAS = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-20000;
+PRAGMA mmap_size=268435456;
+PRAGMA busy_timeout=5000;
+PRAGMA journal_size_limit=6144000;
+"""
+
+# sqlite3 keeps an LRU of prepared statements keyed by SQL text; the module-level SQL constants below always hit it
+STATEMENT_CACHE_SIZE = 256
+
+
 def get_connection(db_path: Path | None = None) -> sqlite3.Connection:
     """Get a connection to the SQLite database.
 
@@ -106,15 +149,47 @@ def get_connection(db_path: Path | None = None) -> sqlite3.Connection:
         db_path: Optional custom path to the database file.
 
     Returns:
-        A SQLite connection with row factory configured.
+        A SQLite connection with row factory and performance PRAGMAs configured.
 
     """
     path = db_path or DB_PATH
-    conn = sqlite3.connect(str(path))
+    conn = sqlite3.connect(str(path), cached_statements=STATEMENT_CACHE_SIZE)
     conn.row_factory = sqlite3.Row
+    conn.executescript(CONNECTION_PRAGMAS)
     return conn
 
 
+_shared_connections: dict[Path, sqlite3.Connection] = {}
+_shared_connections_lock = Lock()
+
+
+def get_shared_connection(db_path: Path | None = None) -> sqlite3.Connection:
+    """Get the long-lived connection for a database file, opening it on first use.
+
+    The connection is in autocommit mode and may be used from any thread; it is closed at interpreter exit.
+    Use this for per-row helpers instead of paying for a connect (and the WAL/SHM file opens) per statement.
+    Rows come back as plain tuples; the hot existence checks never need by-name access.
+
+    Args:
+        db_path: Optional custom path to the database file.
+
+    Returns:
+        The shared SQLite connection for that path.
+
+    """
+    path = db_path or DB_PATH
+    with _shared_connections_lock:
+        conn = _shared_connections.get(path)
+        if conn is None:
+            conn = sqlite3.connect(
+                str(path), check_same_thread=False, isolation_level=None, cached_statements=STATEMENT_CACHE_SIZE
+            )
+            conn.executescript(CONNECTION_PRAGMAS)
+            _shared_connections[path] = conn
+            atexit_register(conn.close)
+        return conn
+
+
 def initialize_database(db_path: Path | None = None) -> None:
     """Initialize the database with the required schema.
 
@@ -123,8 +198,7 @@ def initialize_database(db_path: Path | None = None) -> None:
 
     """
     try:
-        with get_connection(db_path) as conn:
-            conn.executescript(SCHEMA)
+        get_shared_connection(db_path).executescript(SCHEMA)
         logger.debug("Database schema initialized successfully")
     except sqlite3.Error as e:
         logger.exception("Failed to initialize database schema: {}", e)
@@ -134,144 +208,501 @@ def initialize_database(db_path: Path | None = None) -> None:
 # --- Helper functions ---
 
 
-def insert_track(track: dict[str, Any]) -> None:
+INSERT_TRACK_SQL = """
+INSERT OR REPLACE INTO tracks (
+    id, title, artist_name, album_id, album_name, track_number,
+    volume_number, duration, isrc, explicit, audio_quality, audio_mode, media_metadata_tags
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_DOWNLOAD_SQL = """
+INSERT INTO downloads (
+    track_id, file_path, file_size, file_extension, codec, bit_depth, sample_rate, downloaded_at,
+    quality, has_metadata, has_cover, checksum
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+TRACK_EXISTS_SQL = "SELECT 1 FROM tracks WHERE id = ?"
+DOWNLOAD_EXISTS_SQL = "SELECT 1 FROM downloads WHERE track_id = ? LIMIT 1"
+DOWNLOADS_FOR_TRACK_SQL = "SELECT * FROM downloads WHERE track_id = ?"
+GET_STREAM_INFO_SQL = "SELECT stream_json FROM stream_cache WHERE track_id = ? AND quality = ? AND fetched_at > ?"
+PUT_STREAM_INFO_SQL = (
+    "INSERT OR REPLACE INTO stream_cache (track_id, quality, stream_json, fetched_at) VALUES (?, ?, ?, ?)"
+)
+EXISTING_TRACK_IDS_SQL = "SELECT id FROM tracks WHERE id IN ({})"
+DOWNLOAD_QUALITIES_SQL = "SELECT track_id, quality FROM downloads WHERE track_id IN ({}) ORDER BY id"
+DOWNLOADED_TRACK_IDS_SQL = "SELECT DISTINCT track_id FROM downloads WHERE track_id IN ({})"
+
+# Stays well under SQLite's host-parameter limit (999 on older builds)
+IN_QUERY_CHUNK_SIZE = 500
+
+
+def _encode_tags(tags: Iterable[str] | None) -> str | None:
+    """Encode media metadata tags as compact JSON, storing NULL when there are none."""
+    if not tags:
+        return None
+    return _encode_tag_tuple(tuple(tags))
+
+
+@lru_cache(maxsize=128)
+def _encode_tag_tuple(tags: tuple[str, ...]) -> str:
+    """Encode a tag tuple; the same few tag sets recur across a whole library."""
+    return json.dumps(tags, separators=(",", ":"))
+
+
+def _track_row(track: dict[str, Any]) -> tuple[Any, ...]:
+    """Build the INSERT_TRACK_SQL parameters from a track dictionary."""
+    return (
+        track["id"],
+        track["title"],
+        track["artist_name"],
+        track.get("album_id"),
+        track.get("album_name"),
+        track.get("track_number"),
+        track.get("volume_number"),
+        track.get("duration"),
+        track.get("isrc"),
+        track.get("explicit"),
+        track.get("audio_quality"),
+        track.get("audio_mode"),
+        _encode_tags(track.get("media_metadata_tags")),
+    )
+
+
+def _download_row(download: dict[str, Any]) -> tuple[Any, ...]:
+    """Build the INSERT_DOWNLOAD_SQL parameters from a download dictionary."""
+    return (
+        download["track_id"],
+        download["file_path"],
+        download.get("file_size"),
+        download.get("file_extension"),
+        download.get("codec"),
+        download.get("bit_depth"),
+        download.get("sample_rate"),
+        download.get("downloaded_at"),
+        download.get("quality"),
+        download.get("has_metadata"),
+        download.get("has_cover"),
+        download.get("checksum"),
+    )
+
+
+def _build_download_row(  # noqa: PLR0913
+    track_id: str,
+    file_path: str,
+    file_extension: str,
+    downloaded_at: str,
+    *,
+    file_size: int | None = None,
+    codec: str | None = None,
+    bit_depth: int | None = None,
+    sample_rate: int | None = None,
+    quality: str | None = None,
+    has_metadata: bool | None = None,
+    has_cover: bool | None = None,
+    checksum: str | None = None,
+) -> tuple[Any, ...]:
+    """Build the INSERT_DOWNLOAD_SQL parameters straight from fields, skipping the intermediate dictionary.
+
+    The keyword-only arguments mirror ``DownloadMetadata``, so ``**kwargs`` of that type can be passed through.
+    """
+    return (
+        track_id,
+        file_path,
+        file_size,
+        file_extension,
+        codec,
+        bit_depth,
+        sample_rate,
+        downloaded_at,
+        quality,
+        has_metadata,
+        has_cover,
+        checksum,
+    )
+
+
+@contextmanager
+def transaction(db_path: Path | None = None) -> Generator[sqlite3.Connection]:
+    """Run the enclosed statements as one transaction on a connection of their own.
+
+    The shared connection is used from several threads at once, so a BEGIN on it would sweep other threads'
+    statements into this transaction. Commits on success and rolls back if the block raises.
+
+    Args:
+        db_path: Optional custom path to the database file.
+
+    Yields:
+        A SQLite connection, closed when the block exits.
+
+    """
+    with closing(get_connection(db_path)) as conn:
+        conn.isolation_level = None
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+
+def insert_track(track: dict[str, Any], db_path: Path | None = None) -> None:
     """Insert or update a track in the database.
 
     Args:
         track: Dictionary containing track metadata matching the schema.
+        db_path: Optional custom path to the database file.
 
     Raises:
         sqlite3.Error: If the database operation fails.
 
     """
     try:
-        with get_connection() as conn:
-            conn.execute(
-                """
-                INSERT OR REPLACE INTO tracks (
-                    id, title, artist_name, album_id, album_name, track_number,
-                    volume_number, duration, isrc, explicit, audio_quality, audio_mode, media_metadata_tags
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    track["id"],
-                    track["title"],
-                    track["artist_name"],
-                    track.get("album_id"),
-                    track.get("album_name"),
-                    track.get("track_number"),
-                    track.get("volume_number"),
-                    track.get("duration"),
-                    track.get("isrc"),
-                    track.get("explicit"),
-                    track.get("audio_quality"),
-                    track.get("audio_mode"),
-                    json.dumps(track.get("media_metadata_tags", {})),
-                ),
-            )
-            conn.commit()
+        get_shared_connection(db_path).execute(INSERT_TRACK_SQL, _track_row(track))
+    except sqlite3.IntegrityError as e:
+        logger.warning("Constraint hit inserting track {}: {}", track.get("id", "unknown"), e)
+        raise
     except sqlite3.Error as e:
         logger.exception("Failed to insert track {}: {}", track.get("id", "unknown"), e)
         raise
 
 
-def insert_download(download: dict[str, Any]) -> None:
+def insert_tracks_bulk(tracks: Iterable[dict[str, Any]], db_path: Path | None = None) -> None:
+    """Insert or update many tracks in a single transaction.
+
+    Args:
+        tracks: Dictionaries containing track metadata matching the schema.
+        db_path: Optional custom path to the database file.
+
+    Raises:
+        sqlite3.Error: If the database operation fails; no track is written in that case.
+
+    """
+    try:
+        with transaction(db_path) as conn:
+            conn.executemany(INSERT_TRACK_SQL, map(_track_row, tracks))
+    except sqlite3.IntegrityError as e:
+        logger.warning("Constraint hit bulk inserting tracks: {}", e)
+        raise
+    except sqlite3.Error as e:
+        logger.exception("Failed to bulk insert tracks: {}", e)
+        raise
+
+
+def insert_download(download: dict[str, Any], db_path: Path | None = None) -> None:
     """Insert a download record into the database.
 
     Args:
         download: Dictionary containing download metadata matching the schema.
+        db_path: Optional custom path to the database file.
+
+    Raises:
+        sqlite3.Error: If the database operation fails.
+
+    """
+    insert_download_row(_download_row(download), db_path)
+
+
+def insert_download_row(row: tuple[Any, ...], db_path: Path | None = None) -> None:
+    """Insert a download record given as INSERT_DOWNLOAD_SQL parameters.
+
+    Args:
+        row: Positional column values, as built by ``_download_row`` or ``_build_download_row``.
+        db_path: Optional custom path to the database file.
 
     Raises:
         sqlite3.Error: If the database operation fails.
 
     """
     try:
-        with get_connection() as conn:
-            conn.execute(
-                """
-                INSERT INTO downloads (
-                    track_id, file_path, file_size, file_extension, codec, bit_depth, sample_rate, downloaded_at,
-                    quality, has_metadata, has_cover, checksum
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    download["track_id"],
-                    download["file_path"],
-                    download.get("file_size"),
-                    download.get("file_extension"),
-                    download.get("codec"),
-                    download.get("bit_depth"),
-                    download.get("sample_rate"),
-                    download.get("downloaded_at"),
-                    download.get("quality"),
-                    download.get("has_metadata"),
-                    download.get("has_cover"),
-                    download.get("checksum"),
-                ),
-            )
-            conn.commit()
+        get_shared_connection(db_path).execute(INSERT_DOWNLOAD_SQL, row)
+    except sqlite3.IntegrityError as e:
+        logger.warning("Constraint hit inserting download for track {}: {}", row[0], e)
+        raise
     except sqlite3.Error as e:
-        logger.exception("Failed to insert download for track {}: {}", download.get("track_id", "unknown"), e)
+        logger.exception("Failed to insert download for track {}: {}", row[0], e)
         raise
 
 
-def track_exists(track_id: str) -> bool:
+def insert_downloads_bulk(downloads: Iterable[dict[str, Any]], db_path: Path | None = None) -> None:
+    """Insert many download records in a single transaction.
+
+    Args:
+        downloads: Dictionaries containing download metadata matching the schema.
+        db_path: Optional custom path to the database file.
+
+    Raises:
+        sqlite3.Error: If the database operation fails; no download is written in that case.
+
+    """
+    try:
+        with transaction(db_path) as conn:
+            conn.executemany(INSERT_DOWNLOAD_SQL, map(_download_row, downloads))
+    except sqlite3.IntegrityError as e:
+        logger.warning("Constraint hit bulk inserting downloads: {}", e)
+        raise
+    except sqlite3.Error as e:
+        logger.exception("Failed to bulk insert downloads: {}", e)
+        raise
+
+
+def track_exists(track_id: str, db_path: Path | None = None) -> bool:
     """Check if a track exists in the database.
 
     Args:
         track_id: The TIDAL track ID.
+        db_path: Optional custom path to the database file.
 
     Returns:
         True if the track exists in the tracks table, False otherwise.
 
     """
     try:
-        with get_connection() as conn:
-            cur = conn.execute("SELECT 1 FROM tracks WHERE id = ?", (track_id,))
-            return cur.fetchone() is not None
+        cur = get_shared_connection(db_path).execute(TRACK_EXISTS_SQL, (track_id,))
+        return cur.fetchone() is not None
     except sqlite3.Error as e:
         logger.exception("Failed to check if track exists {}: {}", track_id, e)
         return False
 
 
-def download_exists(track_id: str) -> bool:
+def download_exists(track_id: str, db_path: Path | None = None) -> bool:
     """Check if a download exists for a given track.
 
     Args:
         track_id: The TIDAL track ID.
+        db_path: Optional custom path to the database file.
 
     Returns:
         True if at least one download exists for this track, False otherwise.
 
     """
     try:
-        with get_connection() as conn:
-            cur = conn.execute("SELECT 1 FROM downloads WHERE track_id = ? LIMIT 1", (track_id,))
-            return cur.fetchone() is not None
+        cur = get_shared_connection(db_path).execute(DOWNLOAD_EXISTS_SQL, (track_id,))
+        return cur.fetchone() is not None
     except sqlite3.Error as e:
         logger.exception("Failed to check if download exists for track {}: {}", track_id, e)
         return False
 
 
-def get_downloads_for_track(track_id: str) -> list[dict[str, Any]]:
+def get_cached_stream_info(track_id: str, quality: str, max_age: float, db_path: Path | None = None) -> str | None:
+    """Get the persisted stream info for a track in a quality if it was fetched within ``max_age`` seconds.
+
+    Args:
+        track_id: The TIDAL track ID.
+        quality: Quality the stream was obtained in.
+        max_age: Maximum age of the entry in seconds.
+        db_path: Optional custom path to the database file.
+
+    Returns:
+        The serialized stream info, or None if there is no fresh entry.
+
+    """
+    try:
+        cur = get_shared_connection(db_path).execute(GET_STREAM_INFO_SQL, (track_id, quality, time() - max_age))
+        row = cur.fetchone()
+    except sqlite3.Error as e:
+        logger.exception("Failed to read cached stream info for track {}: {}", track_id, e)
+        return None
+    return row[0] if row else None
+
+
+def put_cached_stream_info(track_id: str, quality: str, stream_json: str, db_path: Path | None = None) -> None:
+    """Persist serialized stream info for a track, replacing any previous entry in the same quality.
+
+    Args:
+        track_id: The TIDAL track ID.
+        quality: Quality the stream was obtained in.
+        stream_json: The serialized stream info.
+        db_path: Optional custom path to the database file.
+
+    """
+    try:
+        get_shared_connection(db_path).execute(PUT_STREAM_INFO_SQL, (track_id, quality, stream_json, time()))
+    except sqlite3.Error as e:
+        logger.exception("Failed to cache stream info for track {}: {}", track_id, e)
+
+
+def _select_existing_ids(sql_template: str, ids: Sequence[str], db_path: Path | None) -> set[str]:
+    """Run an ``IN (...)`` lookup over ``ids`` in chunks and return the ids that matched."""
+    conn = get_shared_connection(db_path)
+    found: set[str] = set()
+    for start in range(0, len(ids), IN_QUERY_CHUNK_SIZE):
+        chunk = ids[start : start + IN_QUERY_CHUNK_SIZE]
+        cur = conn.execute(sql_template.format(",".join("?" * len(chunk))), chunk)
+        found.update(row[0] for row in cur)
+    return found
+
+
+def get_best_qualities(track_ids: Sequence[str], db_path: Path | None = None) -> dict[str, str | None]:
+    """Get the best downloaded quality for several tracks with one query per chunk of ids.
+
+    Args:
+        track_ids: The TIDAL track IDs to look up.
+        db_path: Optional custom path to the database file.
+
+    Returns:
+        A mapping containing only the downloaded tracks, to their highest-ranked quality
+        (None if no download recorded one). Ties keep the earliest download, like ``get_best_quality_for_track``.
+
+    """
+    best: dict[str, str | None] = {}
+    try:
+        conn = get_shared_connection(db_path)
+        for start in range(0, len(track_ids), IN_QUERY_CHUNK_SIZE):
+            chunk = track_ids[start : start + IN_QUERY_CHUNK_SIZE]
+            for track_id, quality in conn.execute(DOWNLOAD_QUALITIES_SQL.format(",".join("?" * len(chunk))), chunk):
+                current = best.setdefault(track_id, None)
+                if quality and (current is None or quality_rank(quality) > quality_rank(current)):
+                    best[track_id] = quality
+    except sqlite3.Error as e:
+        logger.exception("Failed to get best qualities for {} tracks: {}", len(track_ids), e)
+        return {}
+    return best
+
+
+def tracks_exist(track_ids: Sequence[str], db_path: Path | None = None) -> set[str]:
+    """Check which of several tracks exist in the database with one query per chunk of ids.
+
+    Args:
+        track_ids: The TIDAL track IDs to look up.
+        db_path: Optional custom path to the database file.
+
+    Returns:
+        The subset of ``track_ids`` present in the tracks table.
+
+    """
+    try:
+        return _select_existing_ids(EXISTING_TRACK_IDS_SQL, track_ids, db_path)
+    except sqlite3.Error as e:
+        logger.exception("Failed to check if {} tracks exist: {}", len(track_ids), e)
+        return set()
+
+
+def downloads_exist(track_ids: Sequence[str], db_path: Path | None = None) -> set[str]:
+    """Check which of several tracks have at least one download with one query per chunk of ids.
+
+    Args:
+        track_ids: The TIDAL track IDs to look up.
+        db_path: Optional custom path to the database file.
+
+    Returns:
+        The subset of ``track_ids`` with a download record.
+
+    """
+    try:
+        return _select_existing_ids(DOWNLOADED_TRACK_IDS_SQL, track_ids, db_path)
+    except sqlite3.Error as e:
+        logger.exception("Failed to check downloads for {} tracks: {}", len(track_ids), e)
+        return set()
+
+
+def get_downloads_for_track(track_id: str, db_path: Path | None = None) -> list[dict[str, Any]]:
     """Get all downloads for a given track ID.
 
     Args:
         track_id: The TIDAL track ID.
+        db_path: Optional custom path to the database file.
 
     Returns:
         List of download records as dictionaries.
 
     """
     try:
-        with get_connection() as conn:
-            cur = conn.execute("SELECT * FROM downloads WHERE track_id = ?", (track_id,))
-            return [dict(row) for row in cur.fetchall()]
+        cur = get_shared_connection(db_path).execute(DOWNLOADS_FOR_TRACK_SQL, (track_id,))
+        columns = [column[0] for column in cur.description]
+        return [dict(zip(columns, row, strict=True)) for row in cur.fetchall()]
     except sqlite3.Error as e:
         logger.exception("Failed to get downloads for track {}: {}", track_id, e)
         return []
 
 
+# Quality ranking (higher is better), keyed by normalized name - covers both enum names and API strings
+QUALITY_RANK: Mapping[str, int] = MappingProxyType(
+    {
+        "hi_res_lossless": 4,
+        "hi_res": 4,
+        "high_lossless": 3,
+        "lossless": 3,
+        "high": 2,
+        "low_320k": 2,
+        "low_96k": 1,
+        "low": 1,
+    }
+)
+
+
+@lru_cache(maxsize=64)
+def quality_rank(quality: str) -> int:
+    """Rank a quality string, normalizing case and spaces; unknown qualities rank 0.
+
+    Only a handful of distinct quality strings ever occur, so results are memoized.
+    """
+    return QUALITY_RANK.get(quality.lower().replace(" ", "_"), 0)
+
+
+# SQL mirror of quality_rank(), so ranking happens in the query instead of over fetched rows
+_QUALITY_RANK_SQL = "CASE lower(replace(quality, ' ', '_')) {} ELSE 0 END".format(
+    " ".join(f"WHEN '{name}' THEN {rank}" for name, rank in QUALITY_RANK.items())
+)
+BEST_QUALITY_SQL = f"""
+SELECT quality FROM downloads
+WHERE track_id = ? AND quality IS NOT NULL AND quality != ''
+ORDER BY {_QUALITY_RANK_SQL} DESC, id
+LIMIT 1
+"""  # noqa: S608
+IS_QUALITY_UPGRADE_SQL = f"""
+SELECT ? > COALESCE(MAX({_QUALITY_RANK_SQL}), -1) FROM downloads
+WHERE track_id = ? AND quality IS NOT NULL AND quality != ''
+"""  # noqa: S608
+
+
+def get_best_quality_for_track(track_id: str, db_path: Path | None = None) -> str | None:
+    """Get the highest-ranked quality downloaded for a track.
+
+    Args:
+        track_id: The TIDAL track ID.
+        db_path: Optional custom path to the database file.
+
+    Returns:
+        The stored quality string, or None if the track has no download with a quality.
+
+    """
+    try:
+        row = get_shared_connection(db_path).execute(BEST_QUALITY_SQL, (track_id,)).fetchone()
+    except sqlite3.Error as e:
+        logger.exception("Failed to get best quality for track {}: {}", track_id, e)
+        return None
+    return row[0] if row else None
+
+
+def is_quality_upgrade(track_id: str, new_quality: str, db_path: Path | None = None) -> bool:
+    """Check whether a quality outranks every quality already downloaded for a track.
+
+    Args:
+        track_id: The TIDAL track ID.
+        new_quality: The candidate quality string.
+        db_path: Optional custom path to the database file.
+
+    Returns:
+        True if the track has no download with a quality or the new quality ranks higher, False otherwise.
+
+    """
+    try:
+        cur = get_shared_connection(db_path).execute(IS_QUALITY_UPGRADE_SQL, (quality_rank(new_quality), track_id))
+        return bool(cur.fetchone()[0])
+    except sqlite3.Error as e:
+        logger.exception("Failed to compare quality for track {}: {}", track_id, e)
+        return True
+
+
+# Fetches every always-present Track attribute in one C-level call
+_TRACK_ATTRS = attrgetter(
+    "id", "name", "artist", "album", "track_num", "volume_num", "duration", "isrc", "explicit", "audio_quality"
+)
+
+
 def track_to_dict(track: Track) -> dict[str, Any]:
     """Convert a TIDAL Track object to a dictionary matching the database schema.
 
@@ -282,18 +713,21 @@ def track_to_dict(track: Track) -> dict[str, Any]:
         Dictionary with track metadata ready for database insertion.
 
     """
+    track_id, title, artist, album, track_number, volume_number, duration, isrc, explicit, audio_quality = _TRACK_ATTRS(
+        track
+    )
     return {
-        "id": str(track.id),
-        "title": track.name,
-        "artist_name": track.artist.name if track.artist else None,
-        "album_id": str(track.album.id) if track.album else None,
-        "album_name": track.album.name if track.album else None,
-        "track_number": track.track_num,
-        "volume_number": track.volume_num,
-        "duration": track.duration,
-        "isrc": track.isrc,
-        "explicit": track.explicit,
-        "audio_quality": track.audio_quality,
+        "id": str(track_id),
+        "title": title,
+        "artist_name": artist.name if artist else None,
+        "album_id": str(album.id) if album else None,
+        "album_name": album.name if album else None,
+        "track_number": track_number,
+        "volume_number": volume_number,
+        "duration": duration,
+        "isrc": isrc,
+        "explicit": explicit,
+        "audio_quality": audio_quality,
         "audio_mode": getattr(track, "audio_mode", None),
         "media_metadata_tags": getattr(track, "media_metadata_tags", []),
     }
@@ -302,6 +736,159 @@ def track_to_dict(track: Track) -> dict[str, Any]:
 # --- Class-based Interface ---
 
 
+# Database files whose schema DownloadDB has already applied in this process
+_initialized_paths: set[Path] = set()
+_initialized_paths_lock = Lock()
+
+# (INSERT_TRACK_SQL, INSERT_DOWNLOAD_SQL) parameter rows queued by mark_track_downloaded
+type DownloadRecord = tuple[tuple[Any, ...], tuple[Any, ...]]
+
+# Signed stream URLs expire within minutes, so persisted stream info is only trusted briefly
+STREAM_INFO_TTL = 60.0
+
+# A writer transaction is committed once it holds this many records or this many seconds after its first one
+WRITE_BATCH_MAX_RECORDS = 512
+WRITE_BATCH_WINDOW = 0.1
+
+# Records to write and the future settled once they are committed; an empty list asks for an immediate commit
+type WriteRequest = tuple[list[DownloadRecord], Future[None]]
+
+
+def _write_records(conn: sqlite3.Connection, records: list[DownloadRecord]) -> None:
+    """Insert track and download records in a single transaction."""
+    with conn:
+        conn.executemany(INSERT_TRACK_SQL, [track_row for track_row, _ in records])
+        conn.executemany(INSERT_DOWNLOAD_SQL, [download_row for _, download_row in records])
+    logger.debug("Marked {} queued tracks as downloaded", len(records))
+
+
+class _DownloadWriter:
+    """Background thread, one per database file, that commits queued download records in grouped transactions.
+
+    Records are held for up to WRITE_BATCH_WINDOW seconds or WRITE_BATCH_MAX_RECORDS records, so the fsync
+    cost is shared across download completions. Every DownloadDB on the same file shares the writer.
+    The track IDs with uncommitted records are counted, so reads only wait for the writer when they need to.
+    """
+
+    def __init__(self, db_path: Path) -> None:
+        self.db_path = db_path
+        self._queue: Queue[WriteRequest | None] = Queue()
+        self._in_flight: Counter[str] = Counter()
+        self._in_flight_lock = Lock()
+        self._thread = Thread(target=self._run, name="download-db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, records: list[DownloadRecord]) -> Future[None]:
+        """Queue records for writing.
+
+        Returns:
+            A future that is resolved once the records are committed, or carries the error if they failed.
+
+        Raises:
+            DBError: If the writer has been stopped.
+
+        """
+        if not self._thread.is_alive():
+            msg = "Download writer is stopped"
+            raise DBError(msg)
+        future: Future[None] = Future()
+        with self._in_flight_lock:
+            self._in_flight.update(download_row[0] for _, download_row in records)
+        self._queue.put((records, future))
+        return future
+
+    def sync(self) -> None:
+        """Commit everything queued so far without waiting out the batch window, and block until it is done."""
+        self.submit([]).result()
+
+    def wait_for(self, track_ids: Iterable[str]) -> None:
+        """Commit queued records now if any of ``track_ids`` has one, so a read of those tracks sees it."""
+        with self._in_flight_lock:
+            pending = any(self._in_flight[track_id] for track_id in track_ids)
+        if pending:
+            self.sync()
+
+    def stop(self) -> None:
+        """Commit queued records and stop the thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def _run(self) -> None:
+        conn = get_connection(self.db_path)
+        try:
+            while (request := self._queue.get()) is not None:
+                requests = [request]
+                stop = self._collect(requests)
+                self._commit(conn, requests)
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _collect(self, requests: list[WriteRequest]) -> bool:
+        """Add queued requests until the batch is full, its window closes or a sync asks for a commit.
+
+        Returns:
+            True if the writer was asked to stop.
+
+        """
+        size = len(requests[0][0])
+        deadline = monotonic() + WRITE_BATCH_WINDOW
+        while requests[-1][0] and size < WRITE_BATCH_MAX_RECORDS:
+            try:
+                request = self._queue.get(timeout=max(0.0, deadline - monotonic()))
+            except Empty:
+                return False
+            if request is None:
+                return True
+            requests.append(request)
+            size += len(request[0])
+        return False
+
+    def _commit(self, conn: sqlite3.Connection, requests: list[WriteRequest]) -> None:
+        """Write the requests in one transaction and settle their futures."""
+        records = [record for request_records, _ in requests for record in request_records]
+        try:
+            if records:
+                _write_records(conn, records)
+        except sqlite3.Error as e:
+            if len(requests) > 1:
+                # Retry each request on its own, so one bad record only fails the caller that queued it
+                for request in requests:
+                    self._commit(conn, [request])
+                return
+            self._release(records)
+            logger.warning("Failed to write {} queued downloads: {}", len(records), e)
+            requests[0][1].set_exception(e)
+            return
+        self._release(records)
+        for _, future in requests:
+            future.set_result(None)
+
+    def _release(self, records: list[DownloadRecord]) -> None:
+        """Stop counting settled records as in flight."""
+        with self._in_flight_lock:
+            self._in_flight.subtract(download_row[0] for _, download_row in records)
+            for _, download_row in records:
+                if self._in_flight[download_row[0]] <= 0:
+                    self._in_flight.pop(download_row[0], None)
+
+
+_writers: dict[Path, _DownloadWriter] = {}
+_writers_lock = Lock()
+
+
+def _get_writer(db_path: Path) -> _DownloadWriter:
+    """Get the writer for a database file, starting it on first use; it is stopped at interpreter exit."""
+    with _writers_lock:
+        writer = _writers.get(db_path)
+        if writer is None:
+            writer = _writers[db_path] = _DownloadWriter(db_path)
+            atexit_register(writer.stop)
+        return writer
+
+
 class DownloadDB:
     """Object-oriented interface for download tracking database operations."""
 
@@ -314,14 +901,27 @@ class DownloadDB:
         """
         self.db_path = db_path or DB_PATH
         self._ensure_initialized()
+        self._conn = get_shared_connection(self.db_path)
+        self._pending: list[DownloadRecord] | None = None
+
+        # All mark_track_downloaded writes go through the file's shared writer thread; flush() checks the
+        # futures of the ones queued through this instance
+        self._writer = _get_writer(self.db_path)
+        self._unconfirmed: list[Future[None]] = []
+        self._unconfirmed_lock = Lock()
+        self._closed = False
 
     def _ensure_initialized(self) -> None:
-        """Ensure the database schema is initialized."""
-        try:
-            initialize_database(self.db_path)
-        except sqlite3.Error as e:
-            logger.exception("Failed to ensure database initialization: {}", e)
-            raise
+        """Ensure the database schema is initialized, once per database file per process."""
+        with _initialized_paths_lock:
+            if self.db_path in _initialized_paths:
+                return
+            try:
+                initialize_database(self.db_path)
+            except sqlite3.Error as e:
+                logger.exception("Failed to ensure database initialization: {}", e)
+                raise
+            _initialized_paths.add(self.db_path)
 
     def is_track_downloaded(self, track: Track | str) -> bool:
         """Check if a track has been downloaded.
@@ -334,7 +934,36 @@ class DownloadDB:
 
         """
         track_id = str(track.id) if isinstance(track, Track) else track
-        return download_exists(track_id)
+        self._writer.wait_for([track_id])
+        return download_exists(track_id, self.db_path)
+
+    def downloaded_track_ids(self, tracks: Iterable[Track | str]) -> set[str]:
+        """Get the IDs of the given tracks that have been downloaded, using batched lookups.
+
+        Args:
+            tracks: Track objects or track ID strings.
+
+        Returns:
+            The track IDs with at least one download record.
+
+        """
+        track_ids = [str(track.id) if isinstance(track, Track) else track for track in tracks]
+        self._writer.wait_for(track_ids)
+        return downloads_exist(track_ids, self.db_path)
+
+    def bulk_lookup(self, tracks: Iterable[Track | str]) -> dict[str, str | None]:
+        """Look up download state for many tracks at once.
+
+        Args:
+            tracks: Track objects or track ID strings.
+
+        Returns:
+            A mapping from each downloaded track ID to its best downloaded quality; missing IDs are not downloaded.
+
+        """
+        track_ids = [str(track.id) if isinstance(track, Track) else track for track in tracks]
+        self._writer.wait_for(track_ids)
+        return get_best_qualities(track_ids, self.db_path)
 
     def mark_track_downloaded(  # noqa: PLR0913
         self,
@@ -350,7 +979,9 @@ class DownloadDB:
         has_cover: bool = False,
         checksum: str | None = None,
     ) -> None:
-        """Mark a track as downloaded by inserting track and download records.
+        """Mark a track as downloaded by queueing track and download records for the writer thread.
+
+        The write is asynchronous: reads of this track wait for it, and ``flush()`` also raises if it failed.
 
         Args:
             track: The TIDAL Track object.
@@ -366,31 +997,90 @@ class DownloadDB:
 
         """
         try:
-            # Insert or update track record
-            self.insert_track_from_obj(track)
-
-            # Insert download record
-            file_path_obj = Path(file_path)
-            download_dict = {
-                "track_id": str(track.id),
-                "file_path": str(file_path),
-                "file_size": file_size,
-                "file_extension": file_path_obj.suffix,
-                "codec": codec,
-                "bit_depth": bit_depth,
-                "sample_rate": sample_rate,
-                "downloaded_at": datetime.now(tz=UTC).isoformat(),
-                "quality": quality,
-                "has_metadata": has_metadata,
-                "has_cover": has_cover,
-                "checksum": checksum,
-            }
-            insert_download(download_dict)
-            logger.debug("Marked track {} as downloaded", track.full_name)
+            record = (
+                _track_row(track_to_dict(track)),
+                _build_download_row(
+                    str(track.id),
+                    str(file_path),
+                    Path(file_path).suffix,
+                    datetime.now(tz=UTC).isoformat(),
+                    file_size=file_size,
+                    codec=codec,
+                    bit_depth=bit_depth,
+                    sample_rate=sample_rate,
+                    quality=quality,
+                    has_metadata=has_metadata,
+                    has_cover=has_cover,
+                    checksum=checksum,
+                ),
+            )
+            if self._pending is not None:
+                self._pending.append(record)
+            else:
+                self._enqueue([record])
+            logger.debug("Queued track {} as downloaded", track.full_name)
         except Exception as e:
             logger.exception("Failed to mark track as downloaded {}: {}", track.full_name, e)
             raise
 
+    @contextmanager
+    def batch(self, *, keep_on_error: bool = False) -> Generator[Self]:
+        """Buffer ``mark_track_downloaded`` calls and queue them as one transaction on exit.
+
+        Nothing is written if the block raises, unless ``keep_on_error`` is set.
+
+        Args:
+            keep_on_error: Still write the buffered records if the block raises, e.g. when each record
+                stands for a file that is already complete on disk.
+
+        Yields:
+            This DownloadDB instance.
+
+        """
+        if self._pending is not None:
+            yield self
+            return
+        self._pending = []
+        completed = False
+        try:
+            yield self
+            completed = True
+        finally:
+            pending, self._pending = self._pending, None
+            if pending and (completed or keep_on_error):
+                self._enqueue(pending)
+
+    def _enqueue(self, records: list[DownloadRecord]) -> None:
+        """Hand records to the writer thread."""
+        if self._closed:
+            msg = "DownloadDB is closed"
+            raise DBError(msg)
+        future = self._writer.submit(records)
+        with self._unconfirmed_lock:
+            self._unconfirmed.append(future)
+
+    def flush(self) -> None:
+        """Block until every write queued through this instance has been committed.
+
+        Raises:
+            DBError: If any of those writes failed; the records queued with a failed write are not stored.
+
+        """
+        with self._unconfirmed_lock:
+            futures, self._unconfirmed = self._unconfirmed, []
+        self._writer.sync()
+        errors = [error for future in futures if (error := future.exception()) is not None]
+        if errors:
+            msg = f"{len(errors)} of {len(futures)} queued download writes failed: {errors[0]}"
+            raise DBError(msg) from errors[0]
+
+    def close(self) -> None:
+        """Flush queued writes and stop accepting new ones; the shared writer thread keeps running."""
+        if self._closed:
+            return
+        self._closed = True
+        self.flush()
+
     def insert_track_from_obj(self, track: Track) -> None:
         """Insert or update a track record from a Track object.
 
@@ -399,7 +1089,7 @@ class DownloadDB:
 
         """
         track_dict = track_to_dict(track)
-        insert_track(track_dict)
+        insert_track(track_dict, self.db_path)
 
     def insert_download_from_obj(self, track: Track, file_path: str | Path, **kwargs: Unpack[DownloadMetadata]) -> None:
         """Insert a download record from a Track object.
@@ -411,15 +1101,34 @@ class DownloadDB:
                 quality, has_metadata, has_cover, checksum).
 
         """
-        file_path_obj = Path(file_path)
-        download_dict = {
-            "track_id": str(track.id),
-            "file_path": str(file_path),
-            "file_extension": file_path_obj.suffix,
-            "downloaded_at": datetime.now(tz=UTC).isoformat(),
-            **kwargs,
-        }
-        insert_download(download_dict)
+        row = _build_download_row(
+            str(track.id), str(file_path), Path(file_path).suffix, datetime.now(tz=UTC).isoformat(), **kwargs
+        )
+        insert_download_row(row, self.db_path)
+
+    def get_stream_info(self, track_id: str, quality: str) -> str | None:
+        """Get persisted stream info for a track in a quality if it is younger than STREAM_INFO_TTL.
+
+        Args:
+            track_id: The TIDAL track ID.
+            quality: Quality the stream was obtained in.
+
+        Returns:
+            The serialized stream info, or None if there is no fresh entry.
+
+        """
+        return get_cached_stream_info(track_id, quality, STREAM_INFO_TTL, self.db_path)
+
+    def put_stream_info(self, track_id: str, quality: str, stream_json: str) -> None:
+        """Persist serialized stream info for a track.
+
+        Args:
+            track_id: The TIDAL track ID.
+            quality: Quality the stream was obtained in.
+            stream_json: The serialized stream info.
+
+        """
+        put_cached_stream_info(track_id, quality, stream_json, self.db_path)
 
     def get_track_downloads(self, track: Track | str) -> list[dict[str, Any]]:
         """Get all download records for a track.
@@ -432,7 +1141,8 @@ class DownloadDB:
 
         """
         track_id = str(track.id) if isinstance(track, Track) else track
-        return get_downloads_for_track(track_id)
+        self._writer.wait_for([track_id])
+        return get_downloads_for_track(track_id, self.db_path)
 
     def get_best_quality_downloaded(self, track: Track | str) -> str | None:
         """Get the best quality that has been downloaded for a track.
@@ -444,36 +1154,9 @@ class DownloadDB:
             The best quality string (e.g., 'hi_res_lossless', 'high_lossless'), or None if not downloaded.
 
         """
-        downloads = self.get_track_downloads(track)
-        if not downloads:
-            return None
-
-        # Quality ranking (higher is better) - supports both enum names and uppercase strings
-        quality_rank = {
-            "hi_res_lossless": 4,
-            "hi_res": 4,
-            "high_lossless": 3,
-            "lossless": 3,
-            "high": 2,
-            "low_320k": 2,
-            "low_96k": 1,
-            "low": 1,
-        }
-
-        # Get the highest quality from all downloads
-        best_quality = None
-        best_rank = -1
-
-        for download in downloads:
-            if quality := download.get("quality"):
-                # Normalize: convert to lowercase and replace spaces/underscores
-                normalized = quality.lower().replace(" ", "_")
-                rank = quality_rank.get(normalized, 0)
-                if rank > best_rank:
-                    best_rank = rank
-                    best_quality = quality
-
-        return best_quality
+        track_id = str(track.id) if isinstance(track, Track) else track
+        self._writer.wait_for([track_id])
+        return get_best_quality_for_track(track_id, self.db_path)
 
     def should_upgrade_quality(self, track: Track, new_quality: str) -> bool:
         """Check if a new quality is better than the existing downloaded quality.
@@ -486,33 +1169,14 @@ class DownloadDB:
             True if the new quality is better, False otherwise.
 
         """
-        existing_quality = self.get_best_quality_downloaded(track)
-        if not existing_quality:
-            return True  # No existing download, so yes, download it
-
-        # Quality ranking (higher is better) - supports both enum names and uppercase strings
-        quality_rank = {
-            "hi_res_lossless": 4,
-            "hi_res": 4,
-            "high_lossless": 3,
-            "lossless": 3,
-            "high": 2,
-            "low_320k": 2,
-            "low_96k": 1,
-            "low": 1,
-        }
-
-        # Normalize both qualities to lowercase with underscores
-        existing_normalized = existing_quality.lower().replace(" ", "_")
-        new_normalized = new_quality.lower().replace(" ", "_")
-
-        existing_rank = quality_rank.get(existing_normalized, 0)
-        new_rank = quality_rank.get(new_normalized, 0)
-
-        return new_rank > existing_rank
+        track_id = str(track.id)
+        self._writer.wait_for([track_id])
+        return is_quality_upgrade(track_id, new_quality, self.db_path)
 
 
 if __name__ == "__main__":
+    setup_logging()
+
     # Initialize database
     initialize_database()
     logger.info("Database initialized at {}", DB_PATH)
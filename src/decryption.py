@@ -1,15 +1,50 @@
+from __future__ import annotations
+
+import os
 from base64 import b64decode
+from functools import lru_cache
 from os import getenv
-from pathlib import Path
+from typing import TYPE_CHECKING
 
 from Crypto.Cipher import AES
-from Crypto.Util import Counter
+from cryptography.hazmat.primitives.ciphers import Cipher, CipherContext, algorithms, modes
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    from pathlib import Path
+
 load_dotenv()
 MASTER_KEY = getenv("MASTER_KEY")
 
 
+def _decode_master_key(master_key: str | None) -> bytes | None:
+    """Decode the base64 master key once, rejecting values that are not a valid AES key length."""
+    if master_key is None:
+        return None
+    key = b64decode(master_key)
+    if len(key) not in AES.key_size:
+        msg = f"MASTER_KEY must decode to 16, 24 or 32 bytes, got {len(key)}"
+        raise ValueError(msg)
+    return key
+
+
+_MASTER_KEY_BYTES = _decode_master_key(MASTER_KEY)
+
+# CTR is a stream mode, so files are decrypted in fixed-size chunks instead of being held in memory whole
+DECRYPT_CHUNK_SIZE = 1 << 20
+
+
+def pwrite_all(fd: int, data: bytes | bytearray | memoryview, offset: int) -> None:
+    """Write all of ``data`` to ``fd`` at ``offset``, continuing after short writes."""
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
+
+
+# Unwrapping is deterministic, so a token seen again (e.g. a track repeated in a playlist) skips the AES step
+@lru_cache(maxsize=1024)
 def decrypt_security_token(security_token: str) -> tuple[bytes, bytes]:
     """Decrypt a security token into a key and nonce pair using AES encryption.
 
@@ -20,13 +55,17 @@ def decrypt_security_token(security_token: str) -> tuple[bytes, bytes]:
     Returns:
       A tuple containing the key and nonce extracted from the decrypted security token.
 
+    Raises:
+      ValueError: If MASTER_KEY is not configured.
+
     """
-    # Decode the base64-encoded strings
-    master_key = b64decode(MASTER_KEY)
+    if _MASTER_KEY_BYTES is None:
+        msg = "MASTER_KEY is not set"
+        raise ValueError(msg)
     decoded_token = b64decode(security_token)
 
     # Initialize decryptor, IV is the first 16 bytes of the security token, the rest is the encrypted part
-    decryptor = AES.new(master_key, AES.MODE_CBC, decoded_token[:16])
+    decryptor = AES.new(_MASTER_KEY_BYTES, AES.MODE_CBC, decoded_token[:16])
     decrypted_security_token = decryptor.decrypt(decoded_token[16:])
 
     key = decrypted_security_token[:16]
@@ -35,6 +74,29 @@ def decrypt_security_token(security_token: str) -> tuple[bytes, bytes]:
     return key, nonce
 
 
+def _ctr_decryptor(key: bytes, nonce: bytes) -> CipherContext:
+    """Create an AES-CTR decryptor for a stream keyed by ``key`` and ``nonce``."""
+    # The CTR IV is the 8-byte nonce followed by a 64-bit block counter starting at zero.
+    # cryptography's OpenSSL backend pipelines AES-NI across blocks, unlike a per-call counter object.
+    return Cipher(algorithms.AES(key), modes.CTR(nonce + bytes(8))).decryptor()
+
+
+def decrypt_bytes(data: bytes, key: bytes, nonce: bytes) -> bytes:
+    """Decrypt an in-memory AES-CTR payload with the provided key and nonce.
+
+    Args:
+      data (bytes): The encrypted payload.
+      key (bytes): The decryption key.
+      nonce (bytes): The nonce used for decryption.
+
+    Returns:
+      The decrypted payload.
+
+    """
+    decryptor = _ctr_decryptor(key, nonce)
+    return decryptor.update(data) + decryptor.finalize()
+
+
 def decrypt_file(encrypted_file_path: Path, decrypted_file_path: Path, key: bytes, nonce: bytes) -> None:
     """Decrypt an encrypted MQA file using AES decryption with the provided key and nonce.
 
@@ -48,14 +110,23 @@ def decrypt_file(encrypted_file_path: Path, decrypted_file_path: Path, key: byte
       The decrypted file content as bytes.
 
     """
-    # Initialize counter and decryptor
-    counter = Counter.new(64, prefix=nonce, initial_value=0)
-    decryptor = AES.new(key, AES.MODE_CTR, counter=counter)
-
-    # Read and decrypt the file
-    with encrypted_file_path.open("rb") as encrypted_file, decrypted_file_path.open("wb") as decrypted_file:
-        decrypted_audio = decryptor.decrypt(encrypted_file.read())
-        decrypted_file.write(decrypted_audio)
-
-    # cleanup: remove the encrypted file after decryption
-    encrypted_file_path.unlink()
+    decryptor = _ctr_decryptor(key, nonce)
+
+    # CTR output is the same length as its input, so the ciphertext is renamed into place and overwritten
+    # chunk by chunk: one read and one write of the data instead of a full copy plus an unlink
+    encrypted_file_path.replace(decrypted_file_path)
+
+    # One reused buffer; OpenSSL's CTR permits update_into with identical input and output
+    buf = bytearray(DECRYPT_CHUNK_SIZE + AES.block_size - 1)
+    view = memoryview(buf)
+
+    with decrypted_file_path.open("r+b", buffering=0) as file:
+        fd = file.fileno()
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        offset = 0
+        while size := file.readinto(view[:DECRYPT_CHUNK_SIZE]):
+            written = decryptor.update_into(view[:size], buf)
+            pwrite_all(fd, view[:written], offset)
+            offset += written
+        pwrite_all(fd, decryptor.finalize(), offset)
@@ -1,31 +1,100 @@
-from asyncio import Lock, Semaphore, gather
+from __future__ import annotations
+
+from asyncio import (
+    Future,
+    Lock,
+    Semaphore,
+    Task,
+    TaskGroup,
+    create_subprocess_exec,
+    create_task,
+    get_running_loop,
+    to_thread,
+    wait_for,
+)
 from asyncio import sleep as async_sleep
-from collections.abc import Callable, Generator
-from contextlib import contextmanager
-from json import loads as json_loads
+from asyncio.subprocess import DEVNULL, PIPE
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
+from os import cpu_count, fsync
 from pathlib import Path
-from shutil import move
-from subprocess import run as subprocess_run
-from tempfile import TemporaryDirectory
+from re import compile as re_compile
+from shutil import copyfile, rmtree
+from tempfile import TemporaryDirectory, mkdtemp
 from time import time
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Self
 
+import mutagen
 from aiofiles import open as aio_open
 from ffmpeg import FFmpeg
-from httpx import AsyncClient, Client, HTTPError, Limits
+from httpx import AsyncClient, HTTPError, Limits, Response, codes
 from loguru import logger
+from mutagen import MutagenError
+from mutagen.flac import FLAC
+from mutagen.mp4 import MP4
+from orjson import loads as orjson_loads
 from tidalapi.media import AudioExtensions, Track
 
 from src.client import TidlClient
-from src.db import DownloadDB
-from src.decryption import decrypt_file, decrypt_security_token
-from src.exceptions import StreamInfoError
+from src.db import DownloadDB, quality_rank
+from src.decryption import decrypt_bytes, decrypt_file, decrypt_security_token, pwrite_all
+from src.exceptions import ContainerError, DBError, DownloadError, StreamInfoError
+from src.mp4 import extract_flac
 from src.services import PlaylistService, TrackService
 from src.stream_info import StreamInfo
 from src.track_metadata import MetadataWriter, TrackMetaData
 
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Callable, Generator
+
+# Track attribute holding the StreamInfo resolved for that track in this session
+STREAM_INFO_ATTR = "_tidl_stream_info"
+
+# Cached stream info is refetched when its signed URLs expire within this many seconds
+STREAM_URL_EXPIRY_MARGIN = 30.0
+
+# ffprobe's format_name for the ISO BMFF family, and its codec_name for MP4 sample entries that differ from the fourcc
+MP4_CONTAINER = "mov,mp4,m4a,3gp,3g2,mj2"
+MP4_SAMPLE_ENTRY_CODECS = MappingProxyType({"mp4a": "aac", "ec-3": "eac3", "ac-3": "ac3", "ac-4": "ac4"})
+
+# Non-DASH files are fetched as byte ranges of this size, with up to this many ranges in flight per file
+RANGE_PART_SIZE = 8 * 1024 * 1024
+RANGED_DOWNLOAD_CONCURRENCY = 4
+
+# Maximum DASH segments per track that are downloading or waiting to be written
+DASH_SEGMENT_WINDOW = 8
+
+# Characters dropped from track names when naming workspace directories (\w keeps Unicode letters, like isalnum)
+_UNSAFE_WORKSPACE_CHARS = re_compile(r"[^\w-]+")
+
+# _write_response_at collects chunks up to this size before each write, since every pwrite is a thread hop
+WRITE_BUFFER_SIZE = 4 * 1024 * 1024
+
+
+def _replace_durably(source: Path, target: Path) -> None:
+    """Move ``source`` over ``target`` so that a crash never leaves a partially written ``target``.
+
+    The data is flushed to disk before the rename. Across filesystems it is first copied to a sibling
+    ``.part`` file, which is then renamed into place.
+    """
+    staged = source
+    if source.stat().st_dev != target.parent.stat().st_dev:
+        staged = target.with_suffix(f"{target.suffix}.part")
+        try:
+            copyfile(source, staged)
+        except BaseException:
+            staged.unlink(missing_ok=True)
+            raise
+    with staged.open("rb") as f:
+        fsync(f.fileno())
+    staged.replace(target)
+    if staged != source:
+        source.unlink()
+
 
 class RateLimiter:
-    """Simple rate limiter to space out API calls."""
+    """Rate limiter that spaces out API calls, safe to share between concurrent tasks."""
 
     def __init__(self, min_interval: float = 0.5) -> None:
         """Initialize rate limiter.
@@ -35,15 +104,22 @@ class RateLimiter:
 
         """
         self.min_interval = min_interval
-        self.last_call = 0.0
+        self._next_allowed = 0.0
+        self._lock = Lock()
 
     async def wait(self) -> None:
-        """Wait if needed to respect rate limit."""
-        now = time()
-        elapsed = now - self.last_call
-        if elapsed < self.min_interval:
-            await async_sleep(self.min_interval - elapsed)
-        self.last_call = time()
+        """Wait if needed to respect rate limit.
+
+        Each caller reserves the next free slot under the lock and then sleeps outside it, so concurrent
+        callers are spaced ``min_interval`` apart without queueing behind each other's sleep.
+        """
+        async with self._lock:
+            # The loop clock is monotonic, unlike time(), so wall-clock jumps cannot burst or stall calls
+            now = get_running_loop().time()
+            delay = max(0.0, self._next_allowed - now)
+            self._next_allowed = max(now, self._next_allowed) + self.min_interval
+        if delay:
+            await async_sleep(delay)
 
 
 class Download:
@@ -92,94 +168,243 @@ class Download:
 
         # Rate limiting
         self.rate_limiter = RateLimiter(min_interval=api_delay)
-        self.api_lock = Lock()  # Serialize API calls to prevent bursts
+
+        # Playlists resolved by this instance, so repeat or retried runs skip the playlist API calls
+        self._playlist_service = PlaylistService(self.tdl_client.session)
+        self._playlist_cache: dict[str, tuple[str, list[Track]]] = {}
+
+        # Successful tracks in the current orchestrate_download run, counted as they finish
+        self._succeeded = 0
 
         # Database integration
         if not skip_db:
             self.db = DownloadDB()
             self.fn_logger.info("Database integration enabled")
 
-        # HTTP client with optimized connection pooling
-        self.httpx_client = Client(
+        # Shared async client for all downloads, so segments and byte ranges reuse keep-alive HTTP/2 connections
+        connections = concurrent_downloads * max(DASH_SEGMENT_WINDOW, RANGED_DOWNLOAD_CONCURRENCY)
+        self.async_httpx_client = AsyncClient(
+            http2=True,
+            # Audio is incompressible, and identity bodies can be read raw, skipping httpx's decoder
+            headers={"Accept-Encoding": "identity"},
             timeout=30.0,
-            limits=Limits(max_connections=concurrent_downloads * 2, max_keepalive_connections=concurrent_downloads),
+            # Sized for every track's segment window or ranges to have their own connection should the CDN only
+            # speak HTTP/1.1, and all of them kept alive so the pool is not churned between tracks
+            limits=Limits(
+                max_connections=connections,
+                max_keepalive_connections=connections,
+                keepalive_expiry=30.0,
+            ),
         )
 
-        # Stream info cache (for retries within same session)
-        self._stream_cache: dict[str, StreamInfo] = {}
+        # Worker processes for whole-file decryption and FLAC extraction, so they neither hold the GIL
+        # nor stall the event loop while other tracks download. Only paths and keys cross the process boundary.
+        # Started on first use, so runs that skip every track never spawn it.
+        self._cpu_pool: ProcessPoolExecutor | None = None
 
     async def orchestrate_download(self, playlist_id: str) -> dict[str, bool]:
         """Manage download process with batching."""
         playlist_name, tracks = self.resolve_tracks_from_playlist(playlist_id)
         self.fn_logger.info("Preparing to download {} tracks in batches of {}", len(tracks), self.batch_size)
-        self.download_dir = self.download_dir / playlist_name
+        # A local rather than reassigning download_dir, so repeat calls do not nest playlist directories
+        target_dir = self.download_dir / playlist_name
+        target_dir.mkdir(parents=True, exist_ok=True)
 
         results: dict[str, bool] = {}
+        self._succeeded = 0
         total_batches = (len(tracks) + self.batch_size - 1) // self.batch_size
+        prefetch: Task[None] | None = None
 
-        # Process tracks in batches
-        for batch_num in range(total_batches):
-            start_idx = batch_num * self.batch_size
-            end_idx = min(start_idx + self.batch_size, len(tracks))
-            batch = tracks[start_idx:end_idx]
+        try:
+            # Process tracks in batches
+            for batch_num in range(total_batches):
+                start_idx = batch_num * self.batch_size
+                end_idx = min(start_idx + self.batch_size, len(tracks))
+                batch = tracks[start_idx:end_idx]
+
+                self.fn_logger.info("Processing batch {}/{} ({} tracks)", batch_num + 1, total_batches, len(batch))
+
+                # Resolve the next batch's stream info while this one is downloading and during the batch delay
+                if prefetch is not None:
+                    await prefetch
+                next_batch = tracks[end_idx : end_idx + self.batch_size]
+                prefetch = create_task(self._prefetch_stream_info(next_batch, target_dir)) if next_batch else None
+
+                # Process batch with concurrency limit
+                batch_results = await self._process_batch(batch, target_dir)
+                results.update(batch_results)
+
+                # Delay between batches (except after last batch)
+                if batch_num < total_batches - 1:
+                    self.fn_logger.info("Waiting {} seconds before next batch...", self.batch_delay)
+                    await async_sleep(self.batch_delay)
+        finally:
+            if prefetch is not None:
+                prefetch.cancel()
+
+        self.fn_logger.info("Downloaded {}/{} tracks successfully", self._succeeded, len(tracks))
+        return results
 
-            self.fn_logger.info("Processing batch {}/{} ({} tracks)", batch_num + 1, total_batches, len(batch))
+    async def __aenter__(self) -> Self:
+        """Return the downloader; ``aclose`` runs when the block exits."""
+        return self
 
-            # Process batch with concurrency limit
-            batch_results = await self._process_batch(batch)
-            results.update(batch_results)
+    async def __aexit__(self, *_: object) -> None:
+        """Close the downloader's client and worker pool."""
+        await self.aclose()
 
-            # Delay between batches (except after last batch)
-            if batch_num < total_batches - 1:
-                self.fn_logger.info("Waiting {} seconds before next batch...", self.batch_delay)
-                await async_sleep(self.batch_delay)
+    async def aclose(self) -> None:
+        """Close the shared async HTTP client and the post-processing worker pool.
 
-        progress = sum(v is True for v in results.values())
-        self.fn_logger.info("Downloaded {}/{} tracks successfully", progress, len(tracks))
-        return results
+        They are shared by every ``orchestrate_download`` call, so this is left to the owner of the downloader.
+        """
+        await self.async_httpx_client.aclose()
+        if self._cpu_pool is not None:
+            pool, self._cpu_pool = self._cpu_pool, None
+            await to_thread(pool.shutdown)
+
+    def _get_cpu_pool(self) -> ProcessPoolExecutor:
+        """Get the post-processing worker pool, starting it on first use."""
+        if self._cpu_pool is None:
+            self._cpu_pool = ProcessPoolExecutor(max_workers=min(cpu_count() or 1, self.concurrent_downloads))
+        return self._cpu_pool
+
+    async def _prefetch_stream_info(self, tracks: list[Track], target_dir: Path | None = None) -> None:
+        """Resolve stream info for upcoming tracks one at a time, behind the rate limiter.
+
+        The results are memoized on the tracks, so ``process_track`` finds them ready. Tracks that will be
+        skipped anyway are left out, and failures are left for ``process_track`` to retry and report.
+        ``target_dir`` is where the tracks are saved, download_dir if None.
+        """
+        downloaded = {} if self.skip_db else await to_thread(self.db.bulk_lookup, tracks)
+        for track in tracks:
+            track_id = str(track.id)
+            if not self._validate_track(track) or self._skip_reason_before_fetch(
+                track,
+                already_downloaded=track_id in downloaded,
+                existing_quality=downloaded.get(track_id),
+                target_dir=target_dir,
+            ):
+                continue
+            await self.rate_limiter.wait()
+            try:
+                await to_thread(self._get_cached_stream_info, track)
+            except Exception as e:  # noqa: BLE001
+                self.fn_logger.debug("Prefetching stream info failed for {}: {}", track.full_name, e)
 
-    async def _process_batch(self, tracks: list[Track]) -> dict[str, bool]:
-        """Process a batch of tracks with concurrency control."""
+    async def _process_batch(self, tracks: list[Track], target_dir: Path) -> dict[str, bool]:
+        """Process a batch of tracks with concurrency control, saving them to the existing ``target_dir``.
+
+        All tracks in the batch share one temporary directory, removed in one go when the batch finishes.
+        It lives in ``target_dir``, so finished files are renamed into place rather than copied.
+        Downloads are queued in the DB as one transaction at the end of the batch and flushed before returning.
+        """
         semaphore = Semaphore(self.concurrent_downloads)
+        downloaded = {} if self.skip_db else await to_thread(self.db.bulk_lookup, tracks)
+        results: dict[str, bool] = {}
 
-        async def process_with_semaphore(track: Track) -> tuple[str, bool]:
+        async def process_with_semaphore(track: Track, batch_dir: Path) -> None:
             async with semaphore:
-                result = await self.process_track(track)
-                return track.full_name, result
+                try:
+                    track_id = str(track.id)
+                    result = await self.process_track(
+                        track,
+                        already_downloaded=track_id in downloaded,
+                        existing_quality=downloaded.get(track_id),
+                        workspace_root=batch_dir,
+                        target_dir=target_dir,
+                    )
+                except Exception:
+                    # Ordinary failures become a False result; cancellation still propagates through the group
+                    self.fn_logger.exception("Failed to process track: {}", track.full_name)
+                    result = False
+                # Recorded as each track finishes, so no task objects are kept around for their results
+                results[track.full_name] = result
+                self._succeeded += result is True
+                self.fn_logger.debug(
+                    "Batch progress: {}/{} tracks done, {} succeeded so far", len(results), len(tracks), self._succeeded
+                )
 
-        results_list = await gather(*(process_with_semaphore(track) for track in tracks), return_exceptions=True)
+        with ExitStack() as stack:
+            if not self.skip_db:
+                # Finished files are on disk, so an interrupted batch still records them
+                stack.enter_context(self.db.batch(keep_on_error=True))
+            batch_dir = Path(stack.enter_context(TemporaryDirectory(prefix=".tidl_batch_", dir=target_dir)))
+            async with TaskGroup() as tg:
+                for track in tracks:
+                    tg.create_task(process_with_semaphore(track, batch_dir))
 
-        return {name: result if isinstance(result, bool) else False for name, result in results_list}
+        if not self.skip_db:
+            try:
+                await to_thread(self.db.flush)
+            except DBError:
+                self.fn_logger.exception("Failed to record downloads of this batch in the DB")
+
+        return results
 
     def resolve_tracks_from_playlist(self, playlist_id: str) -> tuple[str, list[Track]]:
-        """Fetch tracks from a playlist by ID."""
-        playlist_service = PlaylistService(self.tdl_client.session)
-        playlist = playlist_service.get_playlist(playlist_id)
-        tracks = playlist_service.get_playlist_tracks(playlist)
+        """Fetch tracks from a playlist by ID, reusing the result of an earlier call for the same playlist."""
+        if cached := self._playlist_cache.get(playlist_id):
+            playlist_name, tracks = cached
+            # Stream URLs memoized by an earlier run may have expired since
+            for track in tracks:
+                vars(track).pop(STREAM_INFO_ATTR, None)
+            self.fn_logger.debug("Using cached playlist: {} with {} tracks", playlist_name, len(tracks))
+            return playlist_name, list(tracks)
+
+        playlist = self._playlist_service.get_playlist(playlist_id)
+        tracks = self._playlist_service.get_playlist_tracks(playlist)
         self.fn_logger.info("Found playlist: {} with {} tracks", playlist.name, playlist.get_tracks_count())
-        return playlist.name, tracks
+        self._playlist_cache[playlist_id] = (playlist.name, tracks)
+        return playlist.name, list(tracks)
 
-    async def process_track(self, track: Track) -> bool:  # noqa: C901
-        """Process track data."""
+    async def process_track(  # noqa: C901, PLR0911, PLR0912
+        self,
+        track: Track,
+        *,
+        already_downloaded: bool | None = None,
+        existing_quality: str | None = None,
+        workspace_root: Path | None = None,
+        target_dir: Path | None = None,
+    ) -> bool:
+        """Process track data.
+
+        ``already_downloaded`` and ``existing_quality`` let batch callers pass a pre-fetched DB lookup;
+        when ``already_downloaded`` is None the DB is queried instead. ``workspace_root`` is the batch's
+        temporary directory, see ``download_workspace``. ``target_dir`` is where the track is saved,
+        download_dir if None.
+        """
         # Validation
         if not self._validate_track(track):
             return False
 
-        # Serialize API calls to prevent concurrent bursts
-        async with self.api_lock:
+        if already_downloaded is None and not self.skip_db:
+            existing_quality = await to_thread(self.db.get_best_quality_downloaded, track)
+            already_downloaded = existing_quality is not None or await to_thread(self.db.is_track_downloaded, track)
+
+        # Skip without the rate-limited stream info call when the DB and disk already settle it
+        if skip_reason := self._skip_reason_before_fetch(
+            track, already_downloaded=already_downloaded, existing_quality=existing_quality, target_dir=target_dir
+        ):
+            self.fn_logger.info("Skipping {}: {}", track.full_name, skip_reason)
+            return True
+
+        # Only the rate limiter token is serialized, so stream info requests themselves can overlap.
+        # Prefetched stream info needs no API call, so no token either.
+        if getattr(track, STREAM_INFO_ATTR, None) is None:
             await self.rate_limiter.wait()
-            # Get stream info (with caching)
-            try:
-                stream_info = self._get_cached_stream_info(track)
-            except StreamInfoError:
-                self.fn_logger.exception("Failed to get stream info for track: {}", track.full_name)
-                return False
+        # Get stream info (with caching) off the event loop, as the API client is synchronous
+        try:
+            stream_info = await to_thread(self._get_cached_stream_info, track)
+        except StreamInfoError:
+            self.fn_logger.exception("Failed to get stream info for track: {}", track.full_name)
+            return False
 
         # Check database for quality upgrades (if enabled)
-        if not self.skip_db and self.db.is_track_downloaded(track):
+        if not self.skip_db and already_downloaded:
             # Check if new quality is better (use .name to get enum name like "high_lossless")
             new_quality_str = stream_info.quality.name
-            existing_quality = self.db.get_best_quality_downloaded(track)
+            upgrade = not existing_quality or quality_rank(new_quality_str) > quality_rank(existing_quality)
 
             # Debug logging
             self.fn_logger.debug(
@@ -187,10 +412,10 @@ class Download:
                 track.full_name,
                 existing_quality,
                 new_quality_str,
-                self.db.should_upgrade_quality(track, new_quality_str),
+                upgrade,
             )
 
-            if not self.db.should_upgrade_quality(track, new_quality_str):
+            if not upgrade:
                 self.fn_logger.info("Skipping (DB) already-downloaded track: {}", track.full_name)
                 return True
             # Quality upgrade available
@@ -201,13 +426,13 @@ class Download:
 
         # Check if exists on disk
         safe_name = self.track_service.get_track_safe_name(track)
-        final_path, should_skip = self._check_if_exists(safe_name, stream_info.file_extension_atm)
+        final_path, should_skip = self._check_if_exists(safe_name, stream_info.file_extension_atm, target_dir)
 
         if should_skip:
             self.fn_logger.info("Skipping existing file: {}", final_path.name)
 
             # Add to database if not already there
-            if not self.skip_db and not self.db.is_track_downloaded(track):
+            if not self.skip_db and not already_downloaded:
                 try:
                     file_size = final_path.stat().st_size if final_path.exists() else None
                     self.db.mark_track_downloaded(
@@ -225,7 +450,7 @@ class Download:
 
         # Download
         try:
-            with self.download_workspace(track.name) as workspace:
+            with self.download_workspace(track.name, workspace_root) as workspace:
                 success = await self._process_download(stream_info, track, workspace, final_path)
 
                 # Record in database
@@ -249,35 +474,107 @@ class Download:
             return False
 
     def _get_cached_stream_info(self, track: Track) -> StreamInfo:
-        """Get stream info with caching to avoid redundant API calls."""
-        cache_key = str(track.id)
+        """Get stream info with caching to avoid redundant API calls.
+
+        The result is memoized on the Track object itself, so repeat lookups are a single attribute read.
+        """
+        stream_info = getattr(track, STREAM_INFO_ATTR, None)
+        if stream_info is None:
+            track_id = str(track.id)
+            # Looked up in the quality the track service asks for first, stored in the quality it returned
+            stream_info = self._load_persisted_stream_info(track_id, str(track.audio_quality))
+            if stream_info is None:
+                stream_info = self.track_service.get_stream_info(track)
+                if not self.skip_db:
+                    self.db.put_stream_info(track_id, str(stream_info.quality), stream_info.to_json())
+            setattr(track, STREAM_INFO_ATTR, stream_info)
+        return stream_info
+
+    def _load_persisted_stream_info(self, track_id: str, quality: str) -> StreamInfo | None:
+        """Load stream info persisted in ``quality`` by an earlier run, unless stale or its URLs are about to expire."""
+        if self.skip_db or not (stream_json := self.db.get_stream_info(track_id, quality)):
+            return None
+        try:
+            stream_info = StreamInfo.from_json(stream_json)
+        except Exception:
+            self.fn_logger.exception("Discarding unreadable cached stream info for track {}", track_id)
+            return None
+        expires_at = stream_info.expires_at
+        if expires_at is not None and expires_at - time() < STREAM_URL_EXPIRY_MARGIN:
+            return None
+        self.fn_logger.debug("Using cached stream info for track {}", track_id)
+        return stream_info
+
+    def _skip_reason_before_fetch(
+        self,
+        track: Track,
+        *,
+        already_downloaded: bool | None,
+        existing_quality: str | None,
+        target_dir: Path | None = None,
+    ) -> str | None:
+        """Decide from the DB and disk alone whether a track can be skipped without fetching its stream info.
 
-        if cache_key not in self._stream_cache:
-            self._stream_cache[cache_key] = self.track_service.get_stream_info(track, self.tdl_client)
+        A DB download is final once it is at least the track's reported quality, the best TIDAL offers for it.
+        Without a DB, an existing file under any audio extension is enough when skipping existing files.
 
-        return self._stream_cache[cache_key]
+        Returns:
+            Why the track can be skipped, or None if its stream info is needed.
+
+        """
+        if (
+            not self.skip_db
+            and already_downloaded
+            and existing_quality
+            and track.audio_quality
+            and quality_rank(existing_quality) >= quality_rank(track.audio_quality)
+        ):
+            return f"already downloaded in {existing_quality} (DB)"
+
+        if self.skip_existing and self.skip_db:
+            safe_name = self.track_service.get_track_safe_name(track)
+            target_dir = target_dir or self.download_dir
+            for extension in AudioExtensions:
+                if (filepath := target_dir / f"{safe_name}{extension}").exists():
+                    return f"existing file {filepath.name}"
+
+        return None
 
     def _validate_track(self, track: Track) -> bool:
         """Validate track before download."""
         return track.available and track.duration > 0
 
-    def _check_if_exists(self, safe_name: str, file_extension: str) -> tuple[Path, bool]:
-        """Check existing files."""
-        filepath = self.download_dir / f"{safe_name}{file_extension}"
+    def _check_if_exists(
+        self, safe_name: str, file_extension: str, target_dir: Path | None = None
+    ) -> tuple[Path, bool]:
+        """Check existing files in ``target_dir`` (download_dir if None)."""
+        filepath = (target_dir or self.download_dir) / f"{safe_name}{file_extension}"
         should_skip = filepath.exists() and self.skip_existing
         return filepath, should_skip
 
     @contextmanager
-    def download_workspace(self, track_name: str) -> Generator[Path]:
-        """Context manager for download workspace with cleanup."""
-        safe_name = "".join(c for c in track_name if c.isalnum() or c in ("-", "_"))[:50]
+    def download_workspace(self, track_name: str, root: Path | None = None) -> Generator[Path]:
+        """Context manager for download workspace with cleanup.
 
-        with TemporaryDirectory(prefix=f"tidl_{safe_name}_") as temp_dir:
-            workspace = Path(temp_dir)
+        Without ``root`` the workspace is its own temporary directory inside download_dir, so the finished file
+        is renamed into place rather than copied across filesystems. With ``root`` (a batch's temporary
+        directory) it is a subdirectory of it, removed here only on error and otherwise together with ``root``.
+        """
+        safe_name = _UNSAFE_WORKSPACE_CHARS.sub("", track_name)[:50]
+
+        with ExitStack() as stack:
+            if root is None:
+                self.download_dir.mkdir(parents=True, exist_ok=True)
+                temp_dir = TemporaryDirectory(prefix=f".tidl_{safe_name}_", dir=self.download_dir)
+                workspace = Path(stack.enter_context(temp_dir))
+            else:
+                workspace = Path(mkdtemp(prefix=f"{safe_name}_", dir=root))
             try:
                 yield workspace
             except Exception:
                 self.fn_logger.exception("Download workspace error")
+                if root is not None:
+                    rmtree(workspace, ignore_errors=True)
             finally:
                 self.fn_logger.debug("Cleaning up download workspace")
 
@@ -285,146 +582,190 @@ class Download:
         """Pre-process, download, and, post-process track."""
         try:
             if stream_info.is_dash_stream:
-                segment_files = await self._download_dash_stream(stream_info, track, workspace)
-                merged_file = workspace / f"merged{stream_info.file_extension_atm}"
-                self._merge_dash_segments(segment_files, merged_file)
-                downloaded_file = merged_file
+                downloaded_file = await self._download_dash_stream(stream_info, track, workspace)
             else:
-                downloaded_file = self._download_standard_stream(stream_info, track, workspace)
+                downloaded_file = await self._download_standard_stream(stream_info, track, workspace)
 
             if not downloaded_file or not downloaded_file.exists():
                 return False
 
-            processed_file = self._post_process_file(downloaded_file, track, stream_info)
+            processed_file = await self._post_process_file(downloaded_file, track, stream_info)
             if not processed_file or not processed_file.exists():
                 self.fn_logger.error("Post-processing failed for {}", track.full_name)
                 return False
 
-            return self._finalize_download(processed_file, final_path, track)
+            # Renaming and tagging (which may fetch cover art) are blocking, so they run off the event loop
+            return await to_thread(self._finalize_download, processed_file, final_path, track)
 
         except Exception:
             self.fn_logger.exception("Error while processing track: {}", track.full_name)
             return False
 
-    def _download_standard_stream(self, stream_info: StreamInfo, track: Track, workspace: Path) -> Path | None:
+    async def _download_standard_stream(self, stream_info: StreamInfo, track: Track, workspace: Path) -> Path | None:
         """Download single file."""
         temp_file = workspace / f"download{stream_info.file_extension_atm}"
         url = stream_info.urls[0]
 
-        return self._download_stream(url, temp_file, track.name)
-
-    async def _download_dash_stream(self, stream_info: StreamInfo, track: Track, workspace: Path) -> list[Path]:
-        """Download DASH segments."""
-        segments_dir = workspace / "segments"
-        segments_dir.mkdir(exist_ok=True)
-
-        tasks = []
-        segment_files = []
-        for url in stream_info.urls:
-            url_filename = url.split("/")[-1].split("?")[0]
-            filename_stem = url_filename.split("_")[-1].split(".")[0]
-            segment_id = int(filename_stem) if filename_stem.isdecimal() else 0
-
-            file_extension = (
-                AudioExtensions.FLAC if stream_info.needs_flac_extraction else stream_info.file_extension_atm
-            )
-            segment_file = segments_dir / f"segment_{segment_id:03d}{file_extension}"
-            tasks.append(self.download_stream(url, segment_file, track.name))
-            segment_files.append(segment_file)
-
-        await gather(*tasks, return_exceptions=True)
-
-        if stream_info.is_encrypted and stream_info.encryption_key:
-            key, nonce = decrypt_security_token(stream_info.encryption_key)
-            decrypted_files = []
-            for seg_file in segment_files:
-                decrypted_file = seg_file.with_suffix(".decrypted")
-                decrypt_file(seg_file, decrypted_file, key, nonce)
-                decrypted_files.append(decrypted_file)
-            segment_files = decrypted_files
-
-        return segment_files
-
-    async def download_stream(self: "Download", url: str, filepath: Path, description: str) -> Path | None:
-        """Download file asynchronously."""
-        async with AsyncClient() as client:
-            try:
-                response = await client.get(url, timeout=30.0)
-                response.raise_for_status()
-
-                async with aio_open(filepath, "wb") as f:
-                    async for chunk in response.aiter_bytes(chunk_size=8192):
-                        await f.write(chunk)
+        return await self._download_ranged(url, temp_file, track.name)
 
-            except HTTPError:
-                self.fn_logger.exception("Failed to download {}", description)
-                if filepath.exists():
-                    filepath.unlink()
-                return None
+    async def _download_ranged(self, url: str, filepath: Path, description: str) -> Path | None:
+        """Download a file as concurrent byte ranges, so a CDN's per-connection throttling does not cap throughput.
 
-            except Exception:
-                self.fn_logger.exception("Unexpected error during download of {}", description)
-                if filepath.exists():
-                    filepath.unlink()
-                return None
-            else:
-                return filepath
-
-    def _download_stream(self, url: str, filepath: Path, description: str) -> Path | None:
-        """Download file synchronously (fallback)."""
+        The first range request doubles as the probe: if the server ignores ``Range`` and replies 200, its
+        body is the whole file and is simply streamed to disk.
+        """
+        semaphore = Semaphore(RANGED_DOWNLOAD_CONCURRENCY)
         try:
-            response = self.httpx_client.get(url)
-            response.raise_for_status()
-
             with filepath.open("wb") as f:
-                f.write(response.content)
+                fd = f.fileno()
+                first_range = {"Range": f"bytes=0-{RANGE_PART_SIZE - 1}"}
+                async with self.async_httpx_client.stream("GET", url, headers=first_range) as response:
+                    response.raise_for_status()
+                    total_size = self._content_range_total(response)
+                    if total_size is not None:
+                        self._check_content_range(response, 0, RANGE_PART_SIZE - 1)
+                    async with TaskGroup() as tg:
+                        tg.create_task(self._write_response_at(response, fd, 0))
+                        for start in range(RANGE_PART_SIZE, total_size or 0, RANGE_PART_SIZE):
+                            end = min(start + RANGE_PART_SIZE, total_size) - 1
+                            tg.create_task(self._fetch_range(url, fd, start, end, semaphore))
 
         except HTTPError:
             self.fn_logger.exception("Failed to download {}", description)
-            if filepath.exists():
-                filepath.unlink()
+            await to_thread(filepath.unlink, missing_ok=True)
             return None
 
         except Exception:
             self.fn_logger.exception("Unexpected error during download of {}", description)
-            if filepath.exists():
-                filepath.unlink()
+            await to_thread(filepath.unlink, missing_ok=True)
             return None
-
         else:
             return filepath
 
-    def _merge_dash_segments(self, segment_files: list[Path], output_file: Path) -> None:
-        """Merge DASH segments into a single file."""
-        try:
+    async def _fetch_range(self, url: str, fd: int, start: int, end: int, semaphore: Semaphore) -> None:
+        """Fetch bytes ``start``-``end`` (inclusive) of ``url`` and write them at the same offset of ``fd``.
 
-            def get_segment_id(path: Path) -> int:
-                try:
-                    return int(path.stem.split("_")[-1])
-                except (ValueError, IndexError):
-                    return 0
+        Raises:
+            DownloadError: If the server does not answer with the partial content asked for.
+
+        """
+        headers = {"Range": f"bytes={start}-{end}"}
+        async with semaphore, self.async_httpx_client.stream("GET", url, headers=headers) as response:
+            response.raise_for_status()
+            if response.status_code != codes.PARTIAL_CONTENT:
+                msg = f"Range request for bytes {start}-{end} returned {response.status_code}"
+                raise DownloadError(msg)
+            self._check_content_range(response, start, end)
+            await self._write_response_at(response, fd, start)
 
-            sorted_segments = sorted(segment_files, key=get_segment_id)
-            chunk_size = 4 * 1024 * 1024  # 4 MB
+    @staticmethod
+    def _check_content_range(response: Response, start: int, end: int) -> None:
+        """Check that a 206 reply holds bytes ``start``-``end`` (inclusive), or up to the end of a shorter file.
 
-            with output_file.open("wb") as f_target:
-                for i, segment_file in enumerate(sorted_segments, start=1):
-                    if not segment_file.exists():
-                        self.fn_logger.error("Segment file missing: {}", segment_file.name)
+        Raises:
+            DownloadError: If the reply covers another range, whose bytes would otherwise land at the wrong offset.
 
-                    self.fn_logger.debug("Merging segment {}/{}: {}", i, len(sorted_segments), segment_file.name)
+        """
+        content_range = response.headers.get("Content-Range", "")
+        byte_range, _, total = content_range.removeprefix("bytes ").partition("/")
+        first, _, last = byte_range.partition("-")
+        expected_last = min(end, int(total) - 1) if total.isdecimal() else end
+        if not (first.isdecimal() and last.isdecimal()) or (int(first), int(last)) != (start, expected_last):
+            msg = f"Range request for bytes {start}-{end} returned {content_range!r}"
+            raise DownloadError(msg)
 
-                    with segment_file.open("rb") as f_segment:
-                        while chunk := f_segment.read(chunk_size):
-                            f_target.write(chunk)
+    @staticmethod
+    def _content_range_total(response: Response) -> int | None:
+        """Get the full size from a 206 reply's ``Content-Range``, or None if the reply is the whole file.
 
-            self.fn_logger.debug("Successfully merged {} segments into {}", len(sorted_segments), output_file)
+        Raises:
+            DownloadError: If a partial reply does not state the full size, so the rest cannot be requested.
 
-        except Exception:
-            self.fn_logger.exception("Error during binary segment merging")
-            raise
+        """
+        if response.status_code != codes.PARTIAL_CONTENT:
+            return None
+        total = response.headers.get("Content-Range", "").rpartition("/")[2]
+        if not total.isdecimal():
+            msg = f"Partial response without a complete length: {response.headers.get('Content-Range')!r}"
+            raise DownloadError(msg)
+        return int(total)
+
+    @staticmethod
+    def _iter_body(response: Response) -> AsyncIterator[bytes]:
+        """Iterate over a streamed body as received, decoding only if the server compressed it anyway.
 
-    def _post_process_file(self, temp_file: Path, track: Track, stream_info: StreamInfo) -> Path | None:
+        Chunks are whatever the connection delivers; ``_write_response_at`` buffers them into WRITE_BUFFER_SIZE writes.
+        """
+        if response.headers.get("Content-Encoding", "identity").lower() == "identity":
+            return response.aiter_raw()
+        return response.aiter_bytes()
+
+    @staticmethod
+    async def _write_response_at(response: Response, fd: int, offset: int) -> None:
+        """Write a streamed response body to ``fd`` starting at ``offset``, in WRITE_BUFFER_SIZE blocks."""
+        buffer = bytearray()
+        async for chunk in Download._iter_body(response):
+            buffer += chunk
+            if len(buffer) >= WRITE_BUFFER_SIZE:
+                await to_thread(pwrite_all, fd, buffer, offset)
+                offset += len(buffer)
+                buffer.clear()
+        if buffer:
+            await to_thread(pwrite_all, fd, buffer, offset)
+
+    async def _download_dash_stream(self, stream_info: StreamInfo, track: Track, workspace: Path) -> Path:
+        """Download, decrypt, and merge DASH segments as one pipeline.
+
+        Segments are fetched and decrypted concurrently; a single writer appends them to the merged
+        file in segment order as soon as the next one is ready, so segments never round-trip through disk.
+        At most DASH_SEGMENT_WINDOW segments are in flight or awaiting the writer at once, which bounds both
+        the requests per track and the segment data held in memory.
+        """
+        merged_file = workspace / f"merged{stream_info.file_extension_atm}"
+        key_nonce = (
+            decrypt_security_token(stream_info.encryption_key)
+            if stream_info.is_encrypted and stream_info.encryption_key
+            else None
+        )
+
+        loop = get_running_loop()
+        urls = sorted(stream_info.urls, key=self._dash_segment_id)
+        segments: list[Future[bytes]] = [loop.create_future() for _ in urls]
+        window = Semaphore(DASH_SEGMENT_WINDOW)
+
+        async def fetch_segment(url: str, segment: Future[bytes]) -> None:
+            response = await self.async_httpx_client.get(url, timeout=30.0)
+            response.raise_for_status()
+            data = response.content
+            if key_nonce:
+                data = await to_thread(decrypt_bytes, data, *key_nonce)
+            segment.set_result(data)
+
+        async def write_segments() -> None:
+            async with aio_open(merged_file, "wb") as f:
+                for i, segment in enumerate(segments, start=1):
+                    await f.write(await segment)
+                    window.release()
+                    self.fn_logger.debug("Merged segment {}/{} for {}", i, len(segments), track.name)
+
+        async with TaskGroup() as tg:
+            tg.create_task(write_segments())
+            # Slots are taken in segment order and freed once written, so the writer's next segment always has one
+            for url, segment in zip(urls, segments, strict=True):
+                await window.acquire()
+                tg.create_task(fetch_segment(url, segment))
+
+        self.fn_logger.debug("Successfully merged {} segments into {}", len(segments), merged_file)
+        return merged_file
+
+    @staticmethod
+    def _dash_segment_id(url: str) -> int:
+        """Parse the segment number from a DASH segment URL, defaulting to 0."""
+        url_filename = url.rsplit("/", 1)[-1].split("?", 1)[0]
+        filename_stem = url_filename.rsplit("_", 1)[-1].split(".", 1)[0]
+        return int(filename_stem) if filename_stem.isdecimal() else 0
+
+    async def _post_process_file(self, temp_file: Path, track: Track, stream_info: StreamInfo) -> Path | None:
         """Post-process downloaded file."""
         try:
             # Decrypt if needed (skip for DASH files as they're already decrypted)
@@ -437,11 +778,13 @@ class Download:
 
                 key, nonce = decrypt_security_token(stream_info.encryption_key)
                 decrypted_file = temp_file.with_suffix(".decrypted")
-                decrypt_file(temp_file, decrypted_file, key, nonce)
+                await get_running_loop().run_in_executor(
+                    self._get_cpu_pool(), decrypt_file, temp_file, decrypted_file, key, nonce
+                )
                 temp_file = decrypted_file
 
             # Extract FLAC from MP4 if needed
-            codec, container = self._probe_codec_and_container(temp_file)
+            codec, container = await self._probe_codec_and_container(temp_file)
 
             if stream_info.file_extension_atm != stream_info.predicted_file_extension:
                 self.fn_logger.warning(
@@ -455,7 +798,7 @@ class Download:
 
             if stream_info.needs_flac_extraction and codec == "flac" and "mp4" in container:
                 self.fn_logger.warning("FLAC audio in MP4 container detected. Extracting to separate FLAC file.")
-                extracted_file = self._extract_flac(temp_file)
+                extracted_file = await self._extract_flac(temp_file)
                 if extracted_file.exists():
                     return extracted_file
 
@@ -471,10 +814,13 @@ class Download:
             self.fn_logger.exception("Post-processing failed for {}", track.full_name)
             return None
 
-    def _probe_codec_and_container(self, file_path: Path) -> tuple[str, str]:
-        """Ffprobe the file to get codec and container information."""
+    async def _probe_codec_and_container(self, file_path: Path) -> tuple[str, str]:
+        """Get codec and container information from the file headers, falling back to ffprobe."""
+        if probed := await to_thread(self._probe_headers, file_path):
+            return probed
         try:
-            probe_cmd = [
+            # Run ffprobe as an asyncio subprocess so other downloads keep progressing while it runs
+            process = await create_subprocess_exec(
                 "ffprobe",
                 "-v",
                 "quiet",
@@ -483,10 +829,17 @@ class Download:
                 "-of",
                 "json",
                 str(file_path),
-            ]
-            result = subprocess_run(probe_cmd, capture_output=True, text=True, timeout=10, check=False)  # noqa: S603
-            if result.returncode == 0:
-                info = json_loads(result.stdout)
+                stdout=PIPE,
+                stderr=DEVNULL,
+            )
+            try:
+                stdout, _ = await wait_for(process.communicate(), timeout=10)
+            except TimeoutError:
+                process.kill()
+                await process.wait()
+                raise
+            if process.returncode == 0:
+                info = orjson_loads(stdout)
                 codec = info["streams"][0]["codec_name"] if info.get("streams") else ""
                 container = info["format"]["format_name"] if info.get("format") else ""
                 return codec.lower(), container.lower()
@@ -494,9 +847,41 @@ class Download:
             self.fn_logger.exception("ffprobe failed for {}", file_path.name)
         return "", ""
 
-    def _extract_flac(self, mp4_file: Path) -> Path:
-        """Extract FLAC audio from MP4 container."""
+    @staticmethod
+    def _probe_headers(file_path: Path) -> tuple[str, str] | None:
+        """Read codec and container from the FLAC or MP4 headers in-process, named as ffprobe would name them.
+
+        Returns None when the file is neither or its headers cannot be parsed.
+        """
+        try:
+            audio = mutagen.File(file_path, options=[FLAC, MP4])
+        except MutagenError:
+            return None
+        if isinstance(audio, FLAC):
+            return "flac", "flac"
+        if isinstance(audio, MP4) and audio.info.codec:
+            # mutagen reports the stsd sample entry fourcc, with an RFC 6381 suffix for mp4a (e.g. "mp4a.40.2")
+            sample_entry = audio.info.codec.split(".", 1)[0].lower()
+            return MP4_SAMPLE_ENTRY_CODECS.get(sample_entry, sample_entry), MP4_CONTAINER
+        return None
+
+    async def _extract_flac(self, mp4_file: Path) -> Path:
+        """Extract FLAC audio from MP4 container, copying the frames in a worker process and falling back to FFmpeg."""
         output_flac_file = mp4_file.with_suffix(AudioExtensions.FLAC)
+        try:
+            await get_running_loop().run_in_executor(self._get_cpu_pool(), extract_flac, mp4_file, output_flac_file)
+        except ContainerError as e:
+            self.fn_logger.debug("Box-level FLAC extraction failed, falling back to FFmpeg: {}", e)
+            await to_thread(self._extract_flac_ffmpeg, mp4_file, output_flac_file)
+        else:
+            self.fn_logger.debug("Extracted FLAC file: {}", output_flac_file.name)
+
+        await to_thread(mp4_file.unlink, missing_ok=True)
+
+        return output_flac_file
+
+    def _extract_flac_ffmpeg(self, mp4_file: Path, output_flac_file: Path) -> None:
+        """Extract FLAC audio from MP4 container with an FFmpeg stream copy."""
         ffmpeg = (
             FFmpeg()
             .input(url=str(mp4_file))
@@ -515,11 +900,6 @@ class Download:
         else:
             self.fn_logger.debug("Extracted FLAC file: {}", output_flac_file.name)
 
-        if mp4_file.exists():
-            mp4_file.unlink()
-
-        return output_flac_file
-
     def _finalize_download(self, processed_file: Path, final_path: Path, track: Track) -> bool:
         """Finalize the download by moving the temp file to its final location, renaming, and adding metadata."""
         try:
@@ -528,15 +908,17 @@ class Download:
                 return False
 
             target_path = final_path.with_suffix(processed_file.suffix)
-            target_path.parent.mkdir(parents=True, exist_ok=True)
-            move(str(processed_file), str(target_path))
-            self.fn_logger.info("Moved {} to {}", processed_file.name, target_path.name)
 
+            # Tag before moving, so the file only ever appears in the library complete
             if target_path.suffix in (AudioExtensions.FLAC, AudioExtensions.M4A, AudioExtensions.MP4):
-                self._add_metadata(target_path, track)
-                self.fn_logger.debug("Added metadata to {}", target_path.name)
+                self._add_metadata(processed_file, track)
+                self.fn_logger.debug("Added metadata to {}", processed_file.name)
             else:
-                self.fn_logger.debug("Skipping metadata for {}", target_path.name)
+                self.fn_logger.debug("Skipping metadata for {}", processed_file.name)
+
+            target_path.parent.mkdir(parents=True, exist_ok=True)
+            _replace_durably(processed_file, target_path)
+            self.fn_logger.info("Moved {} to {}", processed_file.name, target_path.name)
 
         except Exception:
             self.fn_logger.exception("Failed to finalize download for {}", track.name)
@@ -30,6 +30,10 @@ class InterruptError(TidlError):
     """Operation interrupted by user."""
 
 
+class ContainerError(TidlError):
+    """Audio container parsing related errors."""
+
+
 class MetadataError(TidlError):
     """Metadata writing related errors."""
 
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import mmap as mmap_module
+from mmap import ACCESS_READ, mmap
+from struct import error as struct_error
+from struct import unpack_from
+from typing import TYPE_CHECKING
+
+from src.exceptions import ContainerError
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+type Buffer = bytes | mmap
+
+FLAC_MARKER = b"fLaC"
+
+# Offset of the sample entry's child boxes: SampleEntry (8 bytes) + AudioSampleEntry (20 bytes)
+_AUDIO_SAMPLE_ENTRY_SIZE = 28
+_STREAMINFO_SIZE = 34
+
+# tfhd / trun flags that decide which optional fields are present
+_TFHD_BASE_DATA_OFFSET = 0x01
+_TFHD_SAMPLE_DESCRIPTION_INDEX = 0x02
+_TFHD_DEFAULT_SAMPLE_DURATION = 0x08
+_TRUN_DATA_OFFSET = 0x01
+_TRUN_FIRST_SAMPLE_FLAGS = 0x04
+_TRUN_SAMPLE_DURATION = 0x100
+_TRUN_PER_SAMPLE_FIELDS = (0x100, 0x200, 0x400, 0x800)
+
+
+def iter_boxes(buf: Buffer, start: int, end: int) -> Iterator[tuple[bytes, int, int]]:
+    """Iterate over the ISO BMFF boxes laid out between ``start`` and ``end``.
+
+    Args:
+        buf: The file contents.
+        start: Offset of the first box header.
+        end: Offset just past the last box.
+
+    Yields:
+        ``(box_type, payload_start, box_end)`` for every box.
+
+    Raises:
+        ContainerError: If a box header is truncated or a box overruns ``end``.
+
+    """
+    pos = start
+    while pos < end:
+        if end - pos < 8:  # noqa: PLR2004
+            msg = f"Truncated box header at offset {pos}"
+            raise ContainerError(msg)
+        size, box_type = unpack_from(">I4s", buf, pos)
+        header = 8
+        if size == 1:
+            (size,) = unpack_from(">Q", buf, pos + 8)
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            msg = f"Invalid size {size} for {box_type!r} box at offset {pos}"
+            raise ContainerError(msg)
+        yield box_type, pos + header, pos + size
+        pos += size
+
+
+def find_box(buf: Buffer, start: int, end: int, *path: bytes) -> tuple[int, int] | None:
+    """Find the first box matching a path of box types, e.g. ``b"mdia", b"minf"``.
+
+    Returns:
+        ``(payload_start, box_end)`` of the innermost box, or None if any box on the path is missing.
+
+    """
+    box: tuple[int, int] | None = (start, end)
+    for box_type in path:
+        box = next(((s, e) for t, s, e in iter_boxes(buf, *box) if t == box_type), None)
+        if box is None:
+            return None
+    return box
+
+
+def _flac_metadata(buf: Buffer, stsd: tuple[int, int]) -> bytearray:
+    """Get the FLAC metadata blocks carried by the ``dfLa`` box of a ``fLaC`` sample entry."""
+    # stsd is a full box: version/flags and entry_count precede the sample entries
+    entry_type, entry_start, entry_end = next(iter_boxes(buf, stsd[0] + 8, stsd[1]))
+    if entry_type != FLAC_MARKER:
+        msg = f"Sample entry is {entry_type!r}, not FLAC"
+        raise ContainerError(msg)
+    dfla = find_box(buf, entry_start + _AUDIO_SAMPLE_ENTRY_SIZE, entry_end, b"dfLa")
+    if dfla is None:
+        msg = "FLAC sample entry has no dfLa box"
+        raise ContainerError(msg)
+    metadata = bytearray(buf[dfla[0] + 4 : dfla[1]])
+    if len(metadata) < 4 + _STREAMINFO_SIZE or metadata[0] & 0x7F != 0:
+        msg = "dfLa box does not start with a STREAMINFO block"
+        raise ContainerError(msg)
+    return metadata
+
+
+def _mdhd_timescale(buf: Buffer, mdhd: tuple[int, int]) -> int:
+    """Get the media timescale from an ``mdhd`` box (version 0 or 1)."""
+    return unpack_from(">I", buf, mdhd[0] + (20 if buf[mdhd[0]] == 1 else 12))[0]
+
+
+def _stts_duration(buf: Buffer, stts: tuple[int, int]) -> int:
+    """Sum the sample durations recorded in an ``stts`` box."""
+    (entry_count,) = unpack_from(">I", buf, stts[0] + 4)
+    return sum(
+        count * delta for count, delta in (unpack_from(">II", buf, stts[0] + 8 + i * 8) for i in range(entry_count))
+    )
+
+
+def _traf_duration(buf: Buffer, traf: tuple[int, int], trex_default: int) -> int:
+    """Sum the sample durations of one track fragment, resolving the tfhd/trex defaults."""
+    default_duration = trex_default
+    duration = 0
+    for box_type, start, _ in iter_boxes(buf, *traf):
+        flags = int.from_bytes(buf[start + 1 : start + 4])
+        if box_type == b"tfhd":
+            offset = start + 8
+            offset += 8 if flags & _TFHD_BASE_DATA_OFFSET else 0
+            offset += 4 if flags & _TFHD_SAMPLE_DESCRIPTION_INDEX else 0
+            if flags & _TFHD_DEFAULT_SAMPLE_DURATION:
+                (default_duration,) = unpack_from(">I", buf, offset)
+        elif box_type == b"trun":
+            (sample_count,) = unpack_from(">I", buf, start + 4)
+            if not flags & _TRUN_SAMPLE_DURATION:
+                duration += sample_count * default_duration
+                continue
+            offset = start + 8
+            offset += 4 if flags & _TRUN_DATA_OFFSET else 0
+            offset += 4 if flags & _TRUN_FIRST_SAMPLE_FLAGS else 0
+            stride = 4 * sum(1 for field in _TRUN_PER_SAMPLE_FIELDS if flags & field)
+            duration += sum(unpack_from(">I", buf, offset + i * stride)[0] for i in range(sample_count))
+    return duration
+
+
+def _set_total_samples(metadata: bytearray, duration: int, timescale: int) -> None:
+    """Fill in STREAMINFO's total sample count when the encoder left it unknown, as FFmpeg's muxer does."""
+    streaminfo = 4
+    total_samples = int.from_bytes(metadata[streaminfo + 13 : streaminfo + 18]) & 0xF_FFFF_FFFF
+    sample_rate = int.from_bytes(metadata[streaminfo + 10 : streaminfo + 13]) >> 4
+    if total_samples or not duration or not timescale:
+        return
+    total_samples = min(duration * sample_rate // timescale, 0xF_FFFF_FFFF)
+    metadata[streaminfo + 13] = (metadata[streaminfo + 13] & 0xF0) | (total_samples >> 32)
+    metadata[streaminfo + 14 : streaminfo + 18] = (total_samples & 0xFFFF_FFFF).to_bytes(4)
+
+
+def _mark_last_block(metadata: bytearray) -> None:
+    """Set the last-metadata-block flag on the final block only."""
+    pos = 0
+    while pos + 4 <= len(metadata):
+        length = int.from_bytes(metadata[pos + 1 : pos + 4])
+        is_last = pos + 4 + length >= len(metadata)
+        metadata[pos] = (metadata[pos] & 0x7F) | (0x80 if is_last else 0)
+        pos += 4 + length
+
+
+def _is_frame_start(buf: Buffer, pos: int) -> bool:
+    """Check for the 14-bit FLAC frame sync code (0b11111111111110) at ``pos``."""
+    return (buf[pos] << 8 | buf[pos + 1]) & 0xFFFE == 0xFFF8  # noqa: PLR2004
+
+
+def _flac_layout(buf: Buffer) -> tuple[bytearray, list[tuple[int, int]]]:
+    """Locate the FLAC metadata and the ``mdat`` payloads holding its frames.
+
+    Raises:
+        ContainerError: If the file is not a single-track FLAC-in-MP4 file this parser can copy.
+
+    """
+    top_level = list(iter_boxes(buf, 0, len(buf)))
+    moov = next(((s, e) for t, s, e in top_level if t == b"moov"), None)
+    if moov is None:
+        msg = "No moov box"
+        raise ContainerError(msg)
+    traks = [(s, e) for t, s, e in iter_boxes(buf, *moov) if t == b"trak"]
+    if len(traks) != 1:
+        # Frames are taken from every mdat in order, which is only sound with a single track
+        msg = f"Expected a single track, found {len(traks)}"
+        raise ContainerError(msg)
+    stbl = find_box(buf, *traks[0], b"mdia", b"minf", b"stbl")
+    mdhd = find_box(buf, *traks[0], b"mdia", b"mdhd")
+    stsd = find_box(buf, *stbl, b"stsd") if stbl else None
+    if stbl is None or mdhd is None or stsd is None:
+        msg = "Track has no sample description"
+        raise ContainerError(msg)
+    metadata = _flac_metadata(buf, stsd)
+
+    stts = find_box(buf, *stbl, b"stts")
+    duration = _stts_duration(buf, stts) if stts else 0
+    trex = find_box(buf, *moov, b"mvex", b"trex")
+    trex_default = unpack_from(">I", buf, trex[0] + 12)[0] if trex else 0
+    for box_type, start, end in top_level:
+        if box_type == b"moof":
+            duration += sum(
+                _traf_duration(buf, (s, e), trex_default) for t, s, e in iter_boxes(buf, start, end) if t == b"traf"
+            )
+    _set_total_samples(metadata, duration, _mdhd_timescale(buf, mdhd))
+    _mark_last_block(metadata)
+
+    frames = [(s, e) for t, s, e in top_level if t == b"mdat" and e > s]
+    if not frames or not all(e - s >= 2 and _is_frame_start(buf, s) for s, e in frames):  # noqa: PLR2004
+        msg = "mdat payload does not start with a FLAC frame"
+        raise ContainerError(msg)
+    return metadata, frames
+
+
+def extract_flac(mp4_file: Path, flac_file: Path) -> None:
+    """Copy the FLAC stream out of an MP4 container into a native FLAC file without re-encoding.
+
+    The output is the ``fLaC`` marker, the metadata blocks from the ``dfLa`` box and the frames from
+    every ``mdat`` box in file order.
+
+    Args:
+        mp4_file: The MP4 file with a single FLAC track.
+        flac_file: Where to write the FLAC file. Nothing is written if the input cannot be parsed.
+
+    Raises:
+        ContainerError: If the input is not a FLAC-in-MP4 file this parser can handle.
+
+    """
+    with mp4_file.open("rb") as src:
+        if not mp4_file.stat().st_size:
+            msg = f"{mp4_file.name} is empty"
+            raise ContainerError(msg)
+        with mmap(src.fileno(), 0, access=ACCESS_READ) as buf:
+            # The frames are copied front to back, so let the kernel read ahead aggressively
+            if hasattr(mmap_module, "MADV_SEQUENTIAL"):
+                buf.madvise(mmap_module.MADV_SEQUENTIAL)
+            try:
+                metadata, frames = _flac_layout(buf)
+            except (IndexError, StopIteration, struct_error, ValueError) as e:
+                msg = f"Malformed MP4 box in {mp4_file.name}: {e}"
+                raise ContainerError(msg) from e
+            with flac_file.open("wb") as dst, memoryview(buf) as view:
+                dst.write(FLAC_MARKER)
+                dst.write(metadata)
+                for start, end in frames:
+                    dst.write(view[start:end])
@@ -3,18 +3,15 @@ from __future__ import annotations
 from typing import TYPE_CHECKING
 
 from loguru import logger
-from tidalapi.media import Quality
 
 from src.exceptions import PlaylistError, StreamInfoError, TrackError
-from src.stream_info import StreamInfo
+from src.stream_info import QUALITY_PREFERENCES, StreamInfo
 
 if TYPE_CHECKING:
     from tidalapi import Session
     from tidalapi.media import Track
     from tidalapi.playlist import Playlist
 
-    from src.client import TidlClient
-
 
 CHARACTER_TRANSLATION_TABLE = str.maketrans('"*/:<>?\\|', '＂＊／：＜＞？＼￨')  # noqa: Q000, RUF001
 
@@ -74,7 +71,7 @@ class TrackService:
         logger.debug("Generated safe filename: {}", safe_name)
         return safe_name
 
-    def get_stream_info(self, track: Track, client: TidlClient) -> StreamInfo:
+    def get_stream_info(self, track: Track) -> StreamInfo:
         """Get stream information for a track.
 
         Optimized to try the track's reported quality first, then fallback to trying
@@ -83,20 +80,17 @@ class TrackService:
         # Get the track's reported quality
         reported_quality = track.audio_quality
 
-        # All possible qualities from highest to lowest
-        all_qualities = [Quality.hi_res_lossless, Quality.high_lossless, Quality.low_320k, Quality.low_96k]
-
         # Reorder to prioritize reported quality first
-        if reported_quality in all_qualities:
-            all_qualities.remove(reported_quality)
-            all_qualities.insert(0, reported_quality)
+        if reported_quality in QUALITY_PREFERENCES:
+            all_qualities = [reported_quality, *(q for q in QUALITY_PREFERENCES if q != reported_quality)]
             logger.debug("Prioritizing reported quality {} for track: {}", reported_quality, track.name)
+        else:
+            all_qualities = list(QUALITY_PREFERENCES)
 
         # Try each quality in order
         for quality in all_qualities:
             try:
-                client.session.audio_quality = quality
-                stream_info = StreamInfo.from_track(track)
+                stream_info = StreamInfo.from_track(track, quality)
             except StreamInfoError:
                 logger.debug("Quality {} failed for track: {}, trying next quality", quality, track.name)
                 continue
@@ -1,3 +1,4 @@
+from functools import cache
 from os import environ
 from sys import stdout
 
@@ -19,7 +20,11 @@ log_format = (
 )
 
 
+@cache
 def setup_logging() -> None:
-    """Set up logging configuration for the application."""
+    """Set up logging configuration for the application.
+
+    Only the first call configures loguru; later calls are no-ops.
+    """
     logger.remove()
     logger.add(sink=stdout, level=log_level, format=log_format, colorize=True)
@@ -1,7 +1,32 @@
 from dataclasses import dataclass
+from json import dumps as json_dumps
+from json import loads as json_loads
+from typing import Self
+from urllib.parse import parse_qs, urlsplit
 
+from tidalapi.exceptions import ObjectNotFound, StreamNotAvailable
 from tidalapi.media import AudioExtensions, Codec, Quality, Stream, StreamManifest, Track
 
+# Audio qualities from highest to lowest
+QUALITY_PREFERENCES = (Quality.hi_res_lossless, Quality.high_lossless, Quality.low_320k, Quality.low_96k)
+
+# Stream attributes needed to rebuild a Stream (and from it the StreamManifest) without an API call
+_STREAM_FIELDS = (
+    "track_id",
+    "audio_mode",
+    "audio_quality",
+    "manifest_mime_type",
+    "manifest_hash",
+    "manifest",
+    "album_replay_gain",
+    "album_peak_amplitude",
+    "track_replay_gain",
+    "track_peak_amplitude",
+    "bit_depth",
+    "sample_rate",
+    "media_metadata_tags",
+)
+
 
 @dataclass
 class StreamInfo:
@@ -97,11 +122,48 @@ class StreamInfo:
         """Get bit depth and sample rate."""
         return self.stream.get_audio_resolution()
 
+    @property
+    def expires_at(self) -> float | None:
+        """Get the earliest ``Expires`` timestamp among the signed stream URLs, if they carry one."""
+        expiries = [
+            float(values[0])
+            for url in self.urls
+            if (values := parse_qs(urlsplit(url).query).get("Expires")) and values[0].isdecimal()
+        ]
+        return min(expiries, default=None)
+
+    def to_json(self) -> str:
+        """Serialize the underlying stream so it can be persisted and rebuilt later."""
+        return json_dumps({field: getattr(self.stream, field, None) for field in _STREAM_FIELDS})
+
+    @classmethod
+    def from_json(cls, data: str) -> Self:
+        """Rebuild StreamInfo from ``to_json`` output without calling the API."""
+        stream = Stream()
+        for field, value in json_loads(data).items():
+            setattr(stream, field, value)
+        return cls(stream=stream, manifest=stream.get_stream_manifest())
+
     @classmethod
-    def from_track(cls, track: Track) -> "StreamInfo":
-        """Create StreamInfo from a Track object."""
-        stream = track.get_stream()
+    def from_track(cls, track: Track, quality: Quality | None = None) -> Self:
+        """Create StreamInfo from a Track object, in ``quality`` if given or else the session's quality."""
+        stream = track.get_stream() if quality is None else _get_stream(track, quality)
         manifest = stream.get_stream_manifest()
         stream.media_metadata_tags = getattr(track, "media_metadata_tags", [])
 
         return cls(stream=stream, manifest=manifest)
+
+
+def _get_stream(track: Track, quality: Quality) -> Stream:
+    """Request a track's stream in ``quality``.
+
+    Same request as ``Track.get_stream``, but the quality is passed explicitly instead of being read from the
+    shared session, so concurrent lookups for different qualities cannot interfere.
+    """
+    params = {"playbackmode": "STREAM", "audioquality": quality, "assetpresentation": "FULL"}
+    try:
+        response = track.requests.request("GET", f"tracks/{track.id}/playbackinfopostpaywall", params)
+    except ObjectNotFound as e:
+        msg = "Stream not available for this track"
+        raise StreamNotAvailable(msg) from e
+    return track.requests.map_json(response.json(), parse=Stream().parse)
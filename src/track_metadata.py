@@ -1,5 +1,9 @@
+from array import array
 from dataclasses import dataclass
 from pathlib import Path
+from random import uniform
+from time import sleep
+from typing import TypedDict
 
 import httpx
 import mutagen
@@ -16,9 +20,50 @@ from tidalapi.artist import Artist, Role
 from src.exceptions import CoverImageError
 
 MAX_COVER_IMAGE_SIZE = 3000
-
-
-@dataclass
+COVER_MAX_RETRIES = 3
+COVER_MAX_BACKOFF = 30.0
+COVER_IMAGE_SIZES = (1280, 640, 320)
+
+
+class TrackColumns(TypedDict):
+    """Track fields stored column-wise: index i of every column describes the same track."""
+
+    ids: array[int]
+    durations: array[int]
+    titles: list[str]
+    artists: list[str]
+    albums: list[str]
+    isrcs: list[str]
+
+
+def tracks_to_columns(tracks: list[Track]) -> TrackColumns:
+    """Collect the cheap per-track fields into preallocated parallel columns.
+
+    Unlike TrackMetaData.from_track this makes no network calls and builds no per-track objects,
+    at the cost of losing per-row helpers such as full_title.
+    """
+    count = len(tracks)
+    columns = TrackColumns(
+        ids=array("q", [0]) * count,
+        durations=array("q", [0]) * count,
+        titles=[""] * count,
+        artists=[""] * count,
+        albums=[""] * count,
+        isrcs=[""] * count,
+    )
+
+    for i, track in enumerate(tracks):
+        columns["ids"][i] = int(track.id)
+        columns["durations"][i] = track.duration or 0
+        columns["titles"][i] = track.name or ""
+        columns["artists"][i] = track.artist.name if track.artist else ""
+        columns["albums"][i] = track.album.name if track.album and track.album.name else ""
+        columns["isrcs"][i] = track.isrc or ""
+
+    return columns
+
+
+@dataclass(slots=True)
 class TrackMetaData:
     """Enhanced metadata wrapper for tidalapi Track."""
 
@@ -118,13 +163,12 @@ class TrackMetaData:
             logger.debug("No album available for cover image")
             return b""
 
-        quality_preferences = [1280, 640, 320]
-        for quality in quality_preferences:
+        for quality in COVER_IMAGE_SIZES:
             try:
                 cover_url = track.album.image(quality)
                 logger.debug("Attempting to download cover: {} ({}px)", cover_url, quality)
                 with httpx.Client(timeout=30.0) as client:
-                    response = client.get(cover_url)
+                    response = cls._get_with_rate_limit_retry(client, cover_url)
                     response.raise_for_status()
                     if response.headers.get("content-type", "").startswith("image/"):
                         image_data = response.content
@@ -137,6 +181,30 @@ class TrackMetaData:
         logger.warning("Failed to download cover image for track: {}", track.name)
         return b""
 
+    @classmethod
+    def _get_with_rate_limit_retry(cls, client: httpx.Client, url: str) -> httpx.Response:
+        """GET a URL, backing off while the server answers 429 Too Many Requests.
+
+        Honours a numeric Retry-After header, otherwise waits 1, 2, 4... seconds plus up to a second of jitter,
+        so tracks finalized together do not retry in lockstep. Either delay is capped at COVER_MAX_BACKOFF.
+        At most COVER_MAX_RETRIES requests are made; the last response is returned even if it is still a 429.
+        """
+        response = client.get(url)
+        for attempt in range(COVER_MAX_RETRIES - 1):
+            if response.status_code != httpx.codes.TOO_MANY_REQUESTS:
+                break
+
+            retry_after = response.headers.get("retry-after", "")
+            if retry_after.isdecimal():
+                delay = min(COVER_MAX_BACKOFF, float(retry_after))
+            else:
+                delay = min(COVER_MAX_BACKOFF, 2**attempt + uniform(0, 1))  # noqa: S311
+            logger.debug("Rate limited fetching {}, retrying in {}s", url, delay)
+            sleep(delay)
+            response = client.get(url)
+
+        return response
+
     @classmethod
     def _name_builder_artists(cls, track: Track) -> str:
         """Format all artists for tags."""
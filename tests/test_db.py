@@ -0,0 +1,321 @@
+"""Tests for the download tracking database."""
+
+import sqlite3
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+from src.db import (
+    DOWNLOAD_EXISTS_SQL,
+    IN_QUERY_CHUNK_SIZE,
+    DownloadDB,
+    _write_records,
+    downloads_exist,
+    get_cached_stream_info,
+    get_shared_connection,
+    insert_downloads_bulk,
+    insert_tracks_bulk,
+    track_exists,
+    tracks_exist,
+    transaction,
+)
+from src.exceptions import DBError
+from tidalapi.media import Track
+
+
+def make_track(track_id: int = 1, name: str = "Song") -> MagicMock:
+    """Build a Track stand-in with the attributes the DB layer reads."""
+    track = MagicMock(spec=Track)
+    track.id = track_id
+    track.name = name
+    track.full_name = name
+    track.artist.name = "Artist"
+    track.album.id = 10
+    track.album.name = "Album"
+    track.track_num = 1
+    track.volume_num = 1
+    track.duration = 180
+    track.isrc = "ISRC0001"
+    track.explicit = False
+    track.audio_quality = "LOSSLESS"
+    track.audio_mode = "STEREO"
+    track.media_metadata_tags = []
+    return track
+
+
+@pytest.fixture
+def db(tmp_path: Path) -> Iterator[DownloadDB]:
+    """Provide a DownloadDB backed by a temporary file."""
+    download_db = DownloadDB(tmp_path / "downloads.db")
+    yield download_db
+    download_db.close()
+
+
+class TestDownloadDB:
+    """Test cases for DownloadDB."""
+
+    def test_shared_connection_is_reused(self, db: DownloadDB) -> None:
+        """Test that helpers share one connection per database file."""
+        assert get_shared_connection(db.db_path) is get_shared_connection(db.db_path)
+
+    def test_shared_connection_uses_wal(self, db: DownloadDB) -> None:
+        """Test that connections are opened in WAL mode."""
+        journal_mode = get_shared_connection(db.db_path).execute("PRAGMA journal_mode").fetchone()[0]
+        assert journal_mode == "wal"
+
+    def test_mark_track_downloaded(self, db: DownloadDB) -> None:
+        """Test that a marked track is reported as downloaded in its own database."""
+        track = make_track()
+        assert not db.is_track_downloaded(track)
+
+        db.mark_track_downloaded(track, "/music/Song.flac", quality="high_lossless")
+
+        assert db.is_track_downloaded(track)
+        assert db.get_best_quality_downloaded(track) == "high_lossless"
+
+    def test_should_upgrade_quality(self, db: DownloadDB) -> None:
+        """Test quality upgrade decisions against the best downloaded quality."""
+        track = make_track()
+        assert db.should_upgrade_quality(track, "low_320k")
+
+        db.mark_track_downloaded(track, "/music/Song.m4a", quality="low_320k")
+
+        assert db.should_upgrade_quality(track, "hi_res_lossless")
+        assert not db.should_upgrade_quality(track, "low_96k")
+        assert not db.should_upgrade_quality(track, "LOW_320K")
+
+    def test_batch_writes_on_exit(self, db: DownloadDB) -> None:
+        """Test that batched marks are only visible once the batch exits."""
+        tracks = [make_track(track_id, f"Song {track_id}") for track_id in range(1, 4)]
+
+        with db.batch():
+            for track in tracks:
+                db.mark_track_downloaded(track, f"/music/{track.name}.flac", quality="high_lossless")
+            assert not any(db.is_track_downloaded(track) for track in tracks)
+
+        assert all(db.is_track_downloaded(track) for track in tracks)
+
+    def test_batch_discards_on_error(self, db: DownloadDB) -> None:
+        """Test that nothing is written when the batch block raises."""
+        track = make_track()
+
+        def mark_then_fail() -> None:
+            with db.batch():
+                db.mark_track_downloaded(track, "/music/Song.flac")
+                raise RuntimeError
+
+        with pytest.raises(RuntimeError):
+            mark_then_fail()
+
+        assert not db.is_track_downloaded(track)
+
+    def test_batch_keep_on_error(self, db: DownloadDB) -> None:
+        """Test that keep_on_error still writes what was marked before the block raised."""
+        track = make_track()
+
+        def mark_then_fail() -> None:
+            with db.batch(keep_on_error=True):
+                db.mark_track_downloaded(track, "/music/Song.flac")
+                raise RuntimeError
+
+        with pytest.raises(RuntimeError):
+            mark_then_fail()
+
+        assert db.is_track_downloaded(track)
+
+    def test_bulk_inserts_roll_back_together(self, db: DownloadDB) -> None:
+        """Test that a failing row aborts the whole bulk insert."""
+        rows = [{"track_id": "1", "file_path": "/music/a.flac"}, {"track_id": "2", "file_path": object()}]
+
+        with pytest.raises(sqlite3.ProgrammingError):
+            insert_downloads_bulk(rows, db.db_path)
+
+        assert not db.is_track_downloaded("1")
+
+    def test_insert_tracks_bulk(self, db: DownloadDB) -> None:
+        """Test inserting several tracks in one call."""
+        track_ids = [str(i) for i in range(5)]
+        insert_tracks_bulk(({"id": track_id, "title": "T", "artist_name": "A"} for track_id in track_ids), db.db_path)
+
+        count = get_shared_connection(db.db_path).execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+        assert count == len(track_ids)
+
+    def test_downloaded_track_ids(self, db: DownloadDB) -> None:
+        """Test the batched download lookup returns only downloaded ids."""
+        with db.batch():
+            for track_id in (1, 3):
+                db.mark_track_downloaded(make_track(track_id), f"/music/{track_id}.flac")
+
+        assert db.downloaded_track_ids([make_track(1), "2", "3"]) == {"1", "3"}
+        assert tracks_exist(["1", "2"], db.db_path) == {"1"}
+
+    def test_existence_lookups_span_chunks(self, db: DownloadDB) -> None:
+        """Test that lookups larger than one IN-query chunk still see every id."""
+        track_ids = [str(i) for i in range(IN_QUERY_CHUNK_SIZE * 2 + 1)]
+        insert_downloads_bulk(
+            ({"track_id": track_id, "file_path": f"/music/{track_id}.flac"} for track_id in track_ids), db.db_path
+        )
+
+        assert downloads_exist(track_ids, db.db_path) == set(track_ids)
+
+    def test_best_quality_ranks_across_downloads(self, db: DownloadDB) -> None:
+        """Test that the best quality is chosen by rank regardless of spelling or insert order."""
+        track = make_track()
+        for quality in ("low_96k", "HI_RES_LOSSLESS", "high lossless"):
+            db.mark_track_downloaded(track, f"/music/{quality}.flac", quality=quality)
+
+        assert db.get_best_quality_downloaded(track) == "HI_RES_LOSSLESS"
+        assert not db.should_upgrade_quality(track, "hi_res")
+
+    def test_download_lookup_uses_index(self, db: DownloadDB) -> None:
+        """Test that per-track download lookups are index searches, not table scans."""
+        plan = get_shared_connection(db.db_path).execute(f"EXPLAIN QUERY PLAN {DOWNLOAD_EXISTS_SQL}", ("1",)).fetchall()
+
+        assert any("idx_downloads_track_id" in detail for *_, detail in plan)
+
+    def test_concurrent_marks_are_written(self, db: DownloadDB) -> None:
+        """Test that marks queued from many threads are all committed by the writer thread."""
+        tracks = [make_track(track_id) for track_id in range(50)]
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda track: db.mark_track_downloaded(track, f"/music/{track.id}.flac"), tracks))
+        db.flush()
+
+        assert db.downloaded_track_ids(tracks) == {str(track.id) for track in tracks}
+
+    def test_mark_after_close_raises(self, db: DownloadDB) -> None:
+        """Test that marking through a closed instance fails instead of silently dropping the write."""
+        db.mark_track_downloaded(make_track(), "/music/Song.flac")
+        db.close()
+
+        assert db.is_track_downloaded("1")
+        with pytest.raises(DBError):
+            db.mark_track_downloaded(make_track(2), "/music/Other.flac")
+
+    def test_instances_share_one_writer(self, db: DownloadDB) -> None:
+        """Test that instances on the same file share the writer thread, and closing one leaves it running."""
+        other = DownloadDB(db.db_path)
+        other.close()
+
+        assert other._writer is db._writer
+        db.mark_track_downloaded(make_track(), "/music/Song.flac")
+        db.flush()
+        assert db.is_track_downloaded("1")
+
+    def test_marks_are_grouped_into_one_transaction(self, db: DownloadDB) -> None:
+        """Test that marks queued within the batch window are committed together."""
+        with patch("src.db._write_records", wraps=_write_records) as write:
+            db.mark_track_downloaded(make_track(1), "/music/1.flac")
+            db.mark_track_downloaded(make_track(2), "/music/2.flac")
+            db.flush()
+
+        write.assert_called_once()
+        assert len(write.call_args.args[1]) == 2
+
+    def test_reads_wait_only_for_pending_tracks(self, db: DownloadDB) -> None:
+        """Test that a read skips the writer round trip unless the track it reads has an uncommitted write."""
+        # A long batch window keeps the mark uncommitted until a read asks for it
+        with patch("src.db.WRITE_BATCH_WINDOW", 60.0), patch.object(db._writer, "sync", wraps=db._writer.sync) as sync:
+            assert not db.is_track_downloaded("1")
+            sync.assert_not_called()
+
+            db.mark_track_downloaded(make_track(1), "/music/1.flac")
+            assert db.bulk_lookup(["2"]) == {}
+            sync.assert_not_called()
+
+            assert db.is_track_downloaded("1")
+            sync.assert_called_once()
+
+    def test_flush_raises_on_write_failure(self, db: DownloadDB) -> None:
+        """Test that a failed write is reported by flush instead of being dropped."""
+        with patch("src.db._write_records", side_effect=sqlite3.OperationalError("disk I/O error")):
+            db.mark_track_downloaded(make_track(), "/music/Song.flac")
+            with pytest.raises(DBError, match="disk I/O error"):
+                db.flush()
+
+        assert not db.is_track_downloaded("1")
+        db.flush()
+
+    def test_transaction_isolated_from_shared_connection(self, db: DownloadDB) -> None:
+        """Test that a rolled-back transaction does not take statements run on the shared connection with it."""
+        msg = "boom"
+
+        def fail_inside_transaction() -> None:
+            with transaction(db.db_path):
+                insert_tracks_bulk([{"id": "1", "title": "T", "artist_name": "A"}], db.db_path)
+                raise RuntimeError(msg)
+
+        with pytest.raises(RuntimeError, match=msg):
+            fail_inside_transaction()
+
+        assert track_exists("1", db.db_path)
+
+    def test_media_metadata_tags_encoding(self, db: DownloadDB) -> None:
+        """Test that empty tag lists are stored as NULL and others as compact JSON."""
+        insert_tracks_bulk(
+            [
+                {"id": "1", "title": "T", "artist_name": "A", "media_metadata_tags": []},
+                {"id": "2", "title": "T", "artist_name": "A", "media_metadata_tags": ["LOSSLESS", "HIRES_LOSSLESS"]},
+            ],
+            db.db_path,
+        )
+
+        cur = get_shared_connection(db.db_path).execute("SELECT media_metadata_tags FROM tracks ORDER BY id")
+        assert [row[0] for row in cur] == [None, '["LOSSLESS","HIRES_LOSSLESS"]']
+
+    def test_get_track_downloads_returns_dicts(self, db: DownloadDB) -> None:
+        """Test that full download rows are returned keyed by column name."""
+        db.mark_track_downloaded(make_track(), "/music/Song.flac", quality="high_lossless")
+
+        (download,) = db.get_track_downloads("1")
+
+        assert download["file_path"] == "/music/Song.flac"
+        assert download["file_extension"] == ".flac"
+
+    def test_schema_applied_once_per_path(self, db: DownloadDB) -> None:
+        """Test that further instances for the same file skip the schema script."""
+        with patch("src.db.initialize_database") as initialize:
+            other = DownloadDB(db.db_path)
+            other.close()
+
+        initialize.assert_not_called()
+
+    def test_insert_download_from_obj(self, db: DownloadDB) -> None:
+        """Test that DownloadMetadata keywords land in their matching columns."""
+        db.insert_download_from_obj(make_track(), "/music/Song.m4a", codec="aac", quality="low_320k", has_cover=True)
+
+        (download,) = db.get_track_downloads("1")
+
+        assert (download["codec"], download["quality"], download["has_cover"], download["file_size"]) == (
+            "aac",
+            "low_320k",
+            1,
+            None,
+        )
+
+    def test_stream_info_cache_ttl(self, db: DownloadDB) -> None:
+        """Test that persisted stream info is returned only while it is fresh."""
+        db.put_stream_info("1", "LOSSLESS", '{"track_id": 1}')
+
+        assert db.get_stream_info("1", "LOSSLESS") == '{"track_id": 1}'
+        assert get_cached_stream_info("1", "LOSSLESS", -1.0, db.db_path) is None
+        assert db.get_stream_info("2", "LOSSLESS") is None
+
+    def test_stream_info_cache_keyed_by_quality(self, db: DownloadDB) -> None:
+        """Test that stream info cached in one quality is not returned for another."""
+        db.put_stream_info("1", "LOSSLESS", '{"quality": "LOSSLESS"}')
+        db.put_stream_info("1", "HI_RES_LOSSLESS", '{"quality": "HI_RES_LOSSLESS"}')
+
+        assert db.get_stream_info("1", "LOSSLESS") == '{"quality": "LOSSLESS"}'
+        assert db.get_stream_info("1", "HI_RES_LOSSLESS") == '{"quality": "HI_RES_LOSSLESS"}'
+        assert db.get_stream_info("1", "HIGH") is None
+
+    def test_bulk_lookup(self, db: DownloadDB) -> None:
+        """Test that the batched lookup reports each downloaded track with its best quality."""
+        db.mark_track_downloaded(make_track(1), "/music/1.m4a", quality="low_320k")
+        db.mark_track_downloaded(make_track(1), "/music/1.flac", quality="HI_RES_LOSSLESS")
+        db.mark_track_downloaded(make_track(2), "/music/2.flac")
+
+        assert db.bulk_lookup([make_track(1), "2", "3"]) == {"1": "HI_RES_LOSSLESS", "2": None}
@@ -0,0 +1,75 @@
+"""Tests for stream decryption."""
+
+from base64 import b64encode
+from os import pwrite, urandom
+from pathlib import Path
+from unittest.mock import patch
+
+from Crypto.Cipher import AES
+from Crypto.Util import Counter
+from src.decryption import DECRYPT_CHUNK_SIZE, decrypt_bytes, decrypt_file, decrypt_security_token, pwrite_all
+
+
+class TestDecryptFile:
+    """Test cases for decrypt_file."""
+
+    def test_matches_single_shot_ctr(self, tmp_path: Path) -> None:
+        """Test that chunked decryption matches decrypting the whole payload at once."""
+        key, nonce = urandom(16), urandom(8)
+        plaintext = urandom(DECRYPT_CHUNK_SIZE * 2 + 123)
+        encryptor = AES.new(key, AES.MODE_CTR, counter=Counter.new(64, prefix=nonce, initial_value=0))
+        encrypted_path = tmp_path / "track.encrypted"
+        encrypted_path.write_bytes(encryptor.encrypt(plaintext))
+        decrypted_path = tmp_path / "track.decrypted"
+
+        decrypt_file(encrypted_path, decrypted_path, key, nonce)
+
+        assert decrypted_path.read_bytes() == plaintext
+        assert not encrypted_path.exists()
+
+
+class TestPwriteAll:
+    """Test cases for pwrite_all."""
+
+    def test_continues_after_short_writes(self, tmp_path: Path) -> None:
+        """Test that a write the kernel only partly accepts is resumed until every byte is on disk."""
+        data = urandom(1000)
+        path = tmp_path / "out.bin"
+        path.write_bytes(b"\0" * len(data))
+
+        def short_pwrite(fd: int, buf: memoryview, offset: int) -> int:
+            return pwrite(fd, buf[:7], offset)
+
+        with path.open("r+b") as file, patch("src.decryption.os.pwrite", side_effect=short_pwrite):
+            pwrite_all(file.fileno(), data, 0)
+
+        assert path.read_bytes() == data
+
+
+class TestDecryptBytes:
+    """Test cases for decrypt_bytes."""
+
+    def test_matches_reference_ctr(self) -> None:
+        """Test that in-memory decryption matches a reference AES-CTR implementation."""
+        key, nonce = urandom(16), urandom(8)
+        plaintext = urandom(4096 + 7)
+        encryptor = AES.new(key, AES.MODE_CTR, counter=Counter.new(64, prefix=nonce, initial_value=0))
+
+        assert decrypt_bytes(encryptor.encrypt(plaintext), key, nonce) == plaintext
+
+
+class TestDecryptSecurityToken:
+    """Test cases for decrypt_security_token."""
+
+    def test_unwraps_and_caches(self) -> None:
+        """Test that the token unwraps to the key and nonce, and repeat tokens are served from the cache."""
+        master_key, iv, key, nonce = urandom(32), urandom(16), urandom(16), urandom(8)
+        wrapped = AES.new(master_key, AES.MODE_CBC, iv).encrypt(key + nonce + bytes(8))
+        token = b64encode(iv + wrapped).decode()
+        decrypt_security_token.cache_clear()
+
+        with patch("src.decryption._MASTER_KEY_BYTES", master_key):
+            assert decrypt_security_token(token) == (key, nonce)
+            assert decrypt_security_token(token) == (key, nonce)
+
+        assert decrypt_security_token.cache_info().hits == 1
@@ -0,0 +1,436 @@
+"""Tests for the download pipeline helpers."""
+
+import asyncio
+import gzip
+import struct
+from collections.abc import Iterator
+from itertools import pairwise
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+from src.client import TidlClient
+from src.dl import (
+    DASH_SEGMENT_WINDOW,
+    MP4_CONTAINER,
+    RANGE_PART_SIZE,
+    STREAM_INFO_ATTR,
+    Download,
+    RateLimiter,
+    _replace_durably,
+)
+from src.exceptions import StreamInfoError
+from src.services import TrackService
+from tidalapi.media import Quality, Track
+
+
+def _box(box_type: bytes, payload: bytes = b"") -> bytes:
+    return struct.pack(">I", 8 + len(payload)) + box_type + payload
+
+
+def _full_box(box_type: bytes, payload: bytes) -> bytes:
+    return _box(box_type, bytes(4) + payload)
+
+
+def _mp4_with_sample_entry(fourcc: bytes, config_box: bytes) -> bytes:
+    # SampleEntry + AudioSampleEntry fields: 2 channels, 16 bit, 44.1 kHz
+    audio_entry = bytes(16) + struct.pack(">HHHHI", 2, 16, 0, 0, 44100 << 16)
+    stsd = _full_box(b"stsd", struct.pack(">I", 1) + _box(fourcc, audio_entry + config_box))
+    mdhd = _full_box(b"mdhd", bytes(8) + struct.pack(">II", 44100, 44100))
+    hdlr = _full_box(b"hdlr", bytes(4) + b"soun" + bytes(12))
+    stbl = _box(b"stbl", stsd)
+    mdia = _box(b"mdia", mdhd + hdlr + _box(b"minf", stbl))
+    return _box(b"ftyp", b"isom" + bytes(4) + b"isomiso2") + _box(b"moov", _box(b"trak", mdia))
+
+
+def _serve_playlist_track(downloader: Download, payload: bytes) -> list[httpx.Request]:
+    """Serve a one-track playlist "Playlist" whose plain FLAC stream is ``payload``, without post-processing or tags.
+
+    Returns:
+        The stream requests made, appended to as they arrive.
+
+    """
+    track = MagicMock(spec=Track, id=1, available=True, duration=180, audio_quality=Quality.high_lossless)
+    track.name = track.full_name = "Song"
+    stream_info = MagicMock(
+        is_dash_stream=False,
+        urls=["https://cdn.example/track.flac"],
+        file_extension_atm=".flac",
+        quality=Quality.high_lossless,
+    )
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, stream=httpx.ByteStream(payload))
+
+    async def post_process(downloaded_file: Path, *_: object) -> Path:
+        return downloaded_file
+
+    def finalize(processed_file: Path, final_path: Path, _track: Track) -> bool:
+        processed_file.replace(final_path)
+        return True
+
+    downloader.async_httpx_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    downloader.rate_limiter = RateLimiter(0.0)
+    downloader.track_service = MagicMock(
+        **{"get_track_safe_name.return_value": "Song", "get_stream_info.return_value": stream_info}
+    )
+    service = downloader._playlist_service = MagicMock()
+    service.get_playlist.return_value.name = "Playlist"
+    service.get_playlist_tracks.return_value = [track]
+    downloader._post_process_file = post_process
+    downloader._finalize_download = finalize
+    return requests
+
+
+@pytest.fixture
+def downloader(track_service: TrackService, mock_client: TidlClient, temp_download_dir: Path) -> Iterator[Download]:
+    """Provide a Download instance without database integration."""
+    download = Download(track_service, mock_client, temp_download_dir, skip_db=True)
+    yield download
+    asyncio.run(download.aclose())
+
+
+class TestProbeHeaders:
+    """Test cases for the in-process codec probe."""
+
+    def test_flac_in_mp4(self, tmp_path: Path) -> None:
+        """Test that FLAC sample entries in an MP4 container are detected."""
+        path = tmp_path / "track.mp4"
+        path.write_bytes(_mp4_with_sample_entry(b"fLaC", _full_box(b"dfLa", bytes(38))))
+
+        assert Download._probe_headers(path) == ("flac", MP4_CONTAINER)
+
+    def test_aac_in_mp4(self, tmp_path: Path) -> None:
+        """Test that mp4a sample entries are reported under ffprobe's codec name."""
+        path = tmp_path / "track.m4a"
+        # ES_Descriptor > DecoderConfigDescriptor (MPEG-4 audio) > DecoderSpecificInfo (AAC LC, 44.1 kHz, stereo)
+        decoder_config = bytes([0x04, 17, 0x40, 0x15]) + bytes(11) + bytes([0x05, 2, 0x12, 0x10])
+        esds = _full_box(b"esds", bytes([0x03, 22, 0, 1, 0]) + decoder_config)
+        path.write_bytes(_mp4_with_sample_entry(b"mp4a", esds))
+
+        assert Download._probe_headers(path) == ("aac", MP4_CONTAINER)
+
+    def test_raw_flac(self, tmp_path: Path) -> None:
+        """Test that native FLAC files are detected."""
+        # STREAMINFO: 4096 sample blocks, 44.1 kHz, 2 channels, 16 bit
+        stream_info = struct.pack(">HH", 4096, 4096) + bytes(6) + bytes.fromhex("0AC442F000000000") + bytes(16)
+        path = tmp_path / "track.flac"
+        path.write_bytes(b"fLaC" + bytes([0x80]) + len(stream_info).to_bytes(3, "big") + stream_info)
+
+        assert Download._probe_headers(path) == ("flac", "flac")
+
+    def test_unknown_format(self, tmp_path: Path) -> None:
+        """Test that unparseable files are left to the ffprobe fallback."""
+        path = tmp_path / "track.bin"
+        path.write_bytes(bytes(64))
+
+        assert Download._probe_headers(path) is None
+
+
+class TestRateLimiter:
+    """Test cases for RateLimiter."""
+
+    def test_concurrent_waits_are_spaced(self) -> None:
+        """Test that concurrent callers each get their own slot, min_interval apart."""
+        interval = 0.05
+        limiter = RateLimiter(min_interval=interval)
+
+        async def run() -> list[float]:
+            loop = asyncio.get_running_loop()
+
+            async def call() -> float:
+                await limiter.wait()
+                return loop.time()
+
+            return sorted(await asyncio.gather(*(call() for _ in range(4))))
+
+        times = asyncio.run(run())
+
+        # Allow for clock granularity in the sleeps
+        assert all(later - earlier >= interval * 0.8 for earlier, later in pairwise(times))
+
+
+class TestReplaceDurably:
+    """Test cases for moving finished files into the library."""
+
+    @pytest.mark.parametrize("same_filesystem", [True, False])
+    def test_moves_file(self, tmp_path: Path, *, same_filesystem: bool) -> None:
+        """Test that the target ends up with the data, with no source or ``.part`` file left behind."""
+        source, target = tmp_path / "work" / "merged.flac", tmp_path / "library" / "track.flac"
+        source.parent.mkdir()
+        target.parent.mkdir()
+        source.write_bytes(b"audio")
+        real_stat = Path.stat
+
+        def stat(path: Path, **kwargs: bool) -> object:
+            result = real_stat(path, **kwargs)
+            return result if same_filesystem or path != target.parent else SimpleNamespace(st_dev=-1)
+
+        with patch.object(Path, "stat", stat):
+            _replace_durably(source, target)
+
+        assert target.read_bytes() == b"audio"
+        assert not source.exists()
+        assert list(target.parent.iterdir()) == [target]
+
+
+class TestDownloadWorkspace:
+    """Test cases for download_workspace."""
+
+    def test_batch_root_subdirectories(self, downloader: Download, tmp_path: Path) -> None:
+        """Test that workspaces under a batch root are distinct subdirectories left for the batch cleanup."""
+        with (
+            downloader.download_workspace("Same Name", tmp_path) as first,
+            downloader.download_workspace("Same Name", tmp_path) as second,
+        ):
+            assert first.parent == second.parent == tmp_path
+            assert first != second
+            (first / "segment").write_bytes(b"data")
+
+        assert (first / "segment").exists()
+
+    def test_standalone_workspace_in_download_dir(self, downloader: Download) -> None:
+        """Test that a workspace without a batch root is created next to the finished files and removed after."""
+        with downloader.download_workspace("Track") as workspace:
+            assert workspace.parent == downloader.download_dir
+
+        assert not workspace.exists()
+
+    def test_batch_root_subdirectory_removed_on_error(self, downloader: Download, tmp_path: Path) -> None:
+        """Test that a failing track removes only its own workspace."""
+        msg = "boom"
+        with downloader.download_workspace("Track", tmp_path) as workspace:
+            raise RuntimeError(msg)
+
+        assert not workspace.exists()
+        assert tmp_path.exists()
+
+
+class TestSkipBeforeFetch:
+    """Test cases for skipping tracks before their stream info is fetched."""
+
+    @staticmethod
+    def _track() -> MagicMock:
+        track = MagicMock()
+        track.artist.name, track.name, track.audio_quality = "Artist", "Title", "LOSSLESS"
+        return track
+
+    def test_existing_file_any_extension(self, downloader: Download) -> None:
+        """Test that an existing file is found before the stream's extension is known."""
+        downloader.skip_existing = True
+        (downloader.download_dir / "Artist - Title.m4a").touch()
+
+        assert downloader._skip_reason_before_fetch(self._track(), already_downloaded=None, existing_quality=None)
+
+    def test_missing_file(self, downloader: Download) -> None:
+        """Test that tracks not on disk still go on to fetch stream info."""
+        downloader.skip_existing = True
+
+        assert not downloader._skip_reason_before_fetch(self._track(), already_downloaded=None, existing_quality=None)
+
+    def test_db_quality_not_upgradable(self, downloader: Download) -> None:
+        """Test that a DB download at or above the reported quality is skipped, and lower ones are not."""
+        downloader.skip_db = False
+        track = self._track()
+
+        assert downloader._skip_reason_before_fetch(track, already_downloaded=True, existing_quality="high_lossless")
+        assert not downloader._skip_reason_before_fetch(track, already_downloaded=True, existing_quality="low_320k")
+
+
+class TestPrefetchStreamInfo:
+    """Test cases for prefetching the next batch's stream info."""
+
+    def test_prefetch_skips_settled_tracks(self, downloader: Download) -> None:
+        """Test that only tracks needing stream info are fetched, and failures are left for process_track."""
+        downloader.skip_existing = True
+        downloader.rate_limiter.min_interval = 0
+        (downloader.download_dir / "Artist - Done.flac").touch()
+        tracks = [MagicMock(available=True, duration=1, audio_quality="LOSSLESS") for _ in range(3)]
+        for track, name in zip(tracks, ("Done", "New", "Broken"), strict=True):
+            track.artist.name, track.name = "Artist", name
+        fetched: list[str] = []
+
+        def get_stream_info(track: MagicMock) -> MagicMock:
+            fetched.append(track.name)
+            if track.name == "Broken":
+                raise StreamInfoError(track.name)
+            return MagicMock()
+
+        with patch.object(downloader, "_get_cached_stream_info", side_effect=get_stream_info):
+            asyncio.run(downloader._prefetch_stream_info(tracks))
+
+        assert fetched == ["New", "Broken"]
+
+
+class TestOrchestrateDownload:
+    """Test cases for orchestrate_download."""
+
+    def test_repeat_calls_do_not_nest_playlist_dirs(self, downloader: Download) -> None:
+        """Test that each call saves to download_dir / playlist name without changing download_dir."""
+        root = downloader.download_dir
+        _serve_playlist_track(downloader, b"fLaC")
+
+        assert asyncio.run(downloader.orchestrate_download("abc")) == {"Song": True}
+        assert asyncio.run(downloader.orchestrate_download("abc")) == {"Song": True}
+
+        assert downloader.download_dir == root
+        assert [path.name for path in root.iterdir()] == ["Playlist"]
+        assert [path.name for path in (root / "Playlist").iterdir()] == ["Song.flac"]
+
+    def test_client_stays_open_after_run(self, downloader: Download) -> None:
+        """Test that a run leaves the shared HTTP client open for the next one."""
+        with patch.object(downloader, "resolve_tracks_from_playlist", return_value=("Playlist", [])):
+            asyncio.run(downloader.orchestrate_download("abc"))
+
+        assert not downloader.async_httpx_client.is_closed
+
+    def test_context_manager_closes_client(self, downloader: Download) -> None:
+        """Test that leaving ``async with`` closes the shared HTTP client."""
+
+        async def run() -> None:
+            async with downloader:
+                pass
+
+        asyncio.run(run())
+
+        assert downloader.async_httpx_client.is_closed
+
+
+class TestCpuPool:
+    """Test cases for the post-processing worker pool's lifetime."""
+
+    def test_started_on_first_use_and_shut_down_by_aclose(self, downloader: Download) -> None:
+        """Test that the pool is created lazily, reused, and only shut down when the downloader is closed."""
+        assert downloader._cpu_pool is None
+        pool = downloader._get_cpu_pool()
+        assert downloader._get_cpu_pool() is pool
+
+        asyncio.run(downloader.aclose())
+
+        assert downloader._cpu_pool is None
+        with pytest.raises(RuntimeError):
+            pool.submit(int)
+
+
+class TestResolvePlaylist:
+    """Test cases for resolving playlist tracks."""
+
+    def test_repeat_calls_use_cache(self, downloader: Download) -> None:
+        """Test that a playlist is fetched once per instance, and memoized stream info is dropped on reuse."""
+        track = SimpleNamespace(id=1)
+        service = downloader._playlist_service = MagicMock()
+        service.get_playlist.return_value.name = "Playlist"
+        service.get_playlist_tracks.return_value = [track]
+
+        assert downloader.resolve_tracks_from_playlist("abc") == ("Playlist", [track])
+        setattr(track, STREAM_INFO_ATTR, MagicMock())
+
+        assert downloader.resolve_tracks_from_playlist("abc") == ("Playlist", [track])
+        service.get_playlist.assert_called_once_with("abc")
+        assert not hasattr(track, STREAM_INFO_ATTR)
+
+    def test_second_run_downloads_from_cached_playlist(self, downloader: Download) -> None:
+        """Test that a second run on the same instance resolves the playlist from the cache and downloads again."""
+        payload = b"fLaC" + bytes(64)
+        requests = _serve_playlist_track(downloader, payload)
+        final_path = downloader.download_dir / "Playlist" / "Song.flac"
+
+        assert asyncio.run(downloader.orchestrate_download("abc")) == {"Song": True}
+        final_path.unlink()
+        assert asyncio.run(downloader.orchestrate_download("abc")) == {"Song": True}
+
+        assert final_path.read_bytes() == payload
+        assert len(requests) == 2
+        downloader._playlist_service.get_playlist.assert_called_once_with("abc")
+
+
+class TestDashStream:
+    """Test cases for the DASH segment pipeline."""
+
+    def test_segments_merged_in_order_within_window(self, downloader: Download, tmp_path: Path) -> None:
+        """Test that segments are written in segment order and never exceed the in-flight window."""
+        segment_count = DASH_SEGMENT_WINDOW * 3
+        # Deliberately out of order, as manifests are not guaranteed to list segments sorted
+        urls = [f"https://cdn.example/track_{i}.mp4?token=x" for i in reversed(range(segment_count))]
+        stream_info = MagicMock(urls=urls, is_encrypted=False, file_extension_atm=".mp4")
+        in_flight = peak = 0
+
+        async def get(url: str, **_: object) -> MagicMock:
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.001)
+            in_flight -= 1
+            return MagicMock(content=Download._dash_segment_id(url).to_bytes(2))
+
+        with patch.object(downloader.async_httpx_client, "get", side_effect=get):
+            merged = asyncio.run(downloader._download_dash_stream(stream_info, MagicMock(), tmp_path))
+
+        assert merged.read_bytes() == b"".join(i.to_bytes(2) for i in range(segment_count))
+        assert peak <= DASH_SEGMENT_WINDOW
+
+
+class TestRangedDownload:
+    """Test cases for byte-range downloads of non-DASH streams."""
+
+    PAYLOAD = bytes(range(256)) * (RANGE_PART_SIZE * 2 // 256) + b"tail"
+
+    def _serve(self, *, honour_range: bool) -> httpx.MockTransport:
+        def handler(request: httpx.Request) -> httpx.Response:
+            range_header = request.headers.get("Range")
+            if not honour_range or range_header is None:
+                return httpx.Response(200, stream=httpx.ByteStream(self.PAYLOAD))
+            start, end = (int(bound) for bound in range_header.removeprefix("bytes=").split("-"))
+            end = min(end, len(self.PAYLOAD) - 1)
+            headers = {"Content-Range": f"bytes {start}-{end}/{len(self.PAYLOAD)}"}
+            return httpx.Response(206, stream=httpx.ByteStream(self.PAYLOAD[start : end + 1]), headers=headers)
+
+        return httpx.MockTransport(handler)
+
+    @pytest.mark.parametrize("honour_range", [True, False])
+    def test_reassembles_file(self, downloader: Download, tmp_path: Path, *, honour_range: bool) -> None:
+        """Test that ranged parts land at their offsets, and servers ignoring Range still give the whole file."""
+        downloader.async_httpx_client = httpx.AsyncClient(transport=self._serve(honour_range=honour_range))
+        target = tmp_path / "download.flac"
+
+        assert asyncio.run(downloader._download_ranged("https://cdn.example/track.flac", target, "track")) == target
+        assert target.read_bytes() == self.PAYLOAD
+
+    def test_rejects_misplaced_range(self, downloader: Download, tmp_path: Path) -> None:
+        """Test that a part whose Content-Range differs from the requested range fails the download."""
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            start, end = (int(bound) for bound in request.headers["Range"].removeprefix("bytes=").split("-"))
+            if start:
+                # A misbehaving CDN answering every later part one byte off
+                start += 1
+            end = min(end, len(self.PAYLOAD) - 1)
+            headers = {"Content-Range": f"bytes {start}-{end}/{len(self.PAYLOAD)}"}
+            return httpx.Response(206, stream=httpx.ByteStream(self.PAYLOAD[start : end + 1]), headers=headers)
+
+        downloader.async_httpx_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        target = tmp_path / "download.flac"
+
+        assert asyncio.run(downloader._download_ranged("https://cdn.example/track.flac", target, "track")) is None
+        assert not target.exists()
+
+    def test_decodes_compressed_body(self, downloader: Download, tmp_path: Path) -> None:
+        """Test that a server compressing the body despite Accept-Encoding: identity still yields the audio bytes."""
+        requested_encodings: list[str | None] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requested_encodings.append(request.headers.get("Accept-Encoding"))
+            headers = {"Content-Encoding": "gzip"}
+            return httpx.Response(200, stream=httpx.ByteStream(gzip.compress(self.PAYLOAD)), headers=headers)
+
+        transport = httpx.MockTransport(handler)
+        downloader.async_httpx_client = httpx.AsyncClient(transport=transport, headers={"Accept-Encoding": "identity"})
+        target = tmp_path / "download.flac"
+
+        assert asyncio.run(downloader._download_ranged("https://cdn.example/track.flac", target, "track")) == target
+        assert target.read_bytes() == self.PAYLOAD
+        assert requested_encodings == ["identity"]
@@ -0,0 +1,91 @@
+"""Tests for in-process MP4 container handling."""
+
+import struct
+from pathlib import Path
+
+import pytest
+from mutagen.flac import FLAC
+from src.exceptions import ContainerError
+from src.mp4 import extract_flac
+
+# STREAMINFO: 4096 sample blocks, 44.1 kHz, 2 channels, 16 bit, unknown total samples
+STREAMINFO = struct.pack(">HH", 4096, 4096) + bytes(6) + bytes.fromhex("0AC442F000000000") + bytes(16)
+# Frames only need a valid sync code for the copy; the rest of the payload is opaque
+FRAMES = (b"\xff\xf8" + bytes(30), b"\xff\xf8" + bytes(20), b"\xff\xf8" + bytes(10))
+
+
+def _box(box_type: bytes, payload: bytes = b"") -> bytes:
+    return struct.pack(">I", 8 + len(payload)) + box_type + payload
+
+
+def _full_box(box_type: bytes, payload: bytes, flags: int = 0) -> bytes:
+    return _box(box_type, flags.to_bytes(4) + payload)
+
+
+def _trak(fourcc: bytes) -> bytes:
+    # SampleEntry + AudioSampleEntry fields, then the codec configuration box
+    audio_entry = bytes(16) + struct.pack(">HHHHI", 2, 16, 0, 0, 44100 << 16)
+    dfla = _full_box(b"dfLa", bytes([0x00]) + len(STREAMINFO).to_bytes(3) + STREAMINFO)
+    stsd = _full_box(b"stsd", struct.pack(">I", 1) + _box(fourcc, audio_entry + dfla))
+    stbl = _box(b"stbl", stsd + _full_box(b"stts", struct.pack(">I", 0)))
+    mdhd = _full_box(b"mdhd", bytes(8) + struct.pack(">II", 44100, 0))
+    return _box(b"trak", _box(b"mdia", mdhd + _box(b"minf", stbl)))
+
+
+def _fragmented_mp4(fourcc: bytes = b"fLaC", track_count: int = 1) -> bytes:
+    mvex = _box(b"mvex", _full_box(b"trex", struct.pack(">IIIII", 1, 1, 0, 0, 0)))
+    moov = _box(b"moov", _trak(fourcc) * track_count + mvex)
+    # First fragment: durations from the tfhd default; second: explicit per-sample durations
+    traf1 = _full_box(b"tfhd", struct.pack(">II", 1, 4096), flags=0x08) + _full_box(
+        b"trun", struct.pack(">III", 2, len(FRAMES[0]), len(FRAMES[1])), flags=0x200
+    )
+    traf2 = _full_box(b"tfhd", struct.pack(">I", 1)) + _full_box(b"trun", struct.pack(">II", 1, 100), flags=0x100)
+    return (
+        _box(b"ftyp", b"iso6" + bytes(4))
+        + moov
+        + _box(b"moof", _box(b"traf", traf1))
+        + _box(b"mdat", FRAMES[0] + FRAMES[1])
+        + _box(b"moof", _box(b"traf", traf2))
+        + _box(b"mdat", FRAMES[2])
+    )
+
+
+class TestExtractFlac:
+    """Test cases for extract_flac."""
+
+    def test_fragmented_flac(self, tmp_path: Path) -> None:
+        """Test that frames are copied in order behind the dfLa metadata, with the sample count filled in."""
+        mp4_file, flac_file = tmp_path / "track.mp4", tmp_path / "track.flac"
+        mp4_file.write_bytes(_fragmented_mp4())
+
+        extract_flac(mp4_file, flac_file)
+
+        data = flac_file.read_bytes()
+        assert data.startswith(b"fLaC\x80")
+        assert data.endswith(b"".join(FRAMES))
+        assert FLAC(flac_file).info.total_samples == 4096 * 2 + 100
+
+    def test_rejects_other_codecs(self, tmp_path: Path) -> None:
+        """Test that non-FLAC sample entries are left to the FFmpeg fallback."""
+        mp4_file, flac_file = tmp_path / "track.mp4", tmp_path / "track.flac"
+        mp4_file.write_bytes(_fragmented_mp4(fourcc=b"mp4a"))
+
+        with pytest.raises(ContainerError, match="not FLAC"):
+            extract_flac(mp4_file, flac_file)
+        assert not flac_file.exists()
+
+    def test_rejects_multiple_tracks(self, tmp_path: Path) -> None:
+        """Test that files whose mdat may interleave several tracks are not copied."""
+        mp4_file, flac_file = tmp_path / "track.mp4", tmp_path / "track.flac"
+        mp4_file.write_bytes(_fragmented_mp4(track_count=2))
+
+        with pytest.raises(ContainerError, match="single track"):
+            extract_flac(mp4_file, flac_file)
+
+    def test_rejects_truncated_file(self, tmp_path: Path) -> None:
+        """Test that truncated boxes raise ContainerError instead of a parsing exception."""
+        mp4_file, flac_file = tmp_path / "track.mp4", tmp_path / "track.flac"
+        mp4_file.write_bytes(_fragmented_mp4()[:-5])
+
+        with pytest.raises(ContainerError):
+            extract_flac(mp4_file, flac_file)
@@ -0,0 +1,56 @@
+"""Tests for track metadata helpers."""
+
+from unittest.mock import patch
+
+import httpx
+import pytest
+from src.track_metadata import COVER_MAX_BACKOFF, COVER_MAX_RETRIES, TrackMetaData
+
+
+def _client(*responses: httpx.Response) -> tuple[httpx.Client, list[httpx.Request]]:
+    requests: list[httpx.Request] = []
+    replies = iter(responses)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return next(replies)
+
+    return httpx.Client(transport=httpx.MockTransport(handler)), requests
+
+
+class TestRateLimitRetry:
+    """Test cases for the cover download 429 backoff."""
+
+    def test_retries_until_success(self) -> None:
+        """Test that a 429 is retried after backing off, and the first non-429 response is returned."""
+        client, requests = _client(httpx.Response(429), httpx.Response(200, content=b"cover"))
+
+        with patch("src.track_metadata.sleep") as sleep:
+            response = TrackMetaData._get_with_rate_limit_retry(client, "https://cdn.example/cover.jpg")
+
+        assert response.content == b"cover"
+        assert len(requests) == 2
+        sleep.assert_called_once()
+
+    def test_gives_up_after_max_retries(self) -> None:
+        """Test that no more than COVER_MAX_RETRIES requests are made, and the last 429 is returned."""
+        client, requests = _client(*(httpx.Response(429) for _ in range(COVER_MAX_RETRIES + 1)))
+
+        with patch("src.track_metadata.sleep") as sleep:
+            response = TrackMetaData._get_with_rate_limit_retry(client, "https://cdn.example/cover.jpg")
+
+        assert response.status_code == httpx.codes.TOO_MANY_REQUESTS
+        assert len(requests) == COVER_MAX_RETRIES
+        assert sleep.call_count == COVER_MAX_RETRIES - 1
+
+    @pytest.mark.parametrize("retry_after", ["5", "86400", None])
+    def test_delay_is_capped(self, retry_after: str | None) -> None:
+        """Test that neither Retry-After nor the exponential backoff can exceed COVER_MAX_BACKOFF."""
+        headers = {"Retry-After": retry_after} if retry_after else {}
+        client, _ = _client(httpx.Response(429, headers=headers), httpx.Response(200))
+
+        with patch("src.track_metadata.sleep") as sleep:
+            TrackMetaData._get_with_rate_limit_retry(client, "https://cdn.example/cover.jpg")
+
+        (delay,) = sleep.call_args.args
+        assert delay <= COVER_MAX_BACKOFF